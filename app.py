@@ -22,6 +22,20 @@ if 'authenticated_user' not in st.session_state:
     st.session_state['authenticated_user'] = None
 if 'admin_authenticated' not in st.session_state:
     st.session_state['admin_authenticated'] = False
+if 'book_search_cache' not in st.session_state:
+    # Narrows results keystroke by keystroke instead of searching again
+    st.session_state['book_search_cache'] = dm.SearchCache()
+
+# Browse page sizes: every card is a row of widgets, the table is one widget
+BROWSE_PAGE_SIZE = {"Cards": 20, "Table": 200}
+
+# Dashboard active-loan orderings: label -> (column, descending)
+LOAN_ORDERS = {
+    "Borrowed (oldest first)": ('borrow_date', False),
+    "Borrowed (newest first)": ('borrow_date', True),
+    "Book title": ('book_title', False),
+    "Member name": ('user_name', False),
+}
 
 # --- DIALOGS (Global Scope to avoid Nesting Errors) ---
 
@@ -154,9 +168,11 @@ if st.session_state.view_mode == "admin":
             st.header("Dashboard")
             col1, col2, col3 = st.columns(3)
             col1.metric("Total Books", len(books))
-            col2.metric("Active Loans", len(transactions[transactions['status'] == 'ACTIVE']))
+            active_loans = dm.search_active_loans()
+            pending_returns = dm.get_transactions_by_status('RETURN_REQUESTED')
+            col2.metric("Active Loans", len(active_loans))
             # Lend requests in pending, Return requests in transactions
-            col3.metric("Pending Actions", len(pending) + len(transactions[transactions['status'] == 'RETURN_REQUESTED']))
+            col3.metric("Pending Actions", len(pending) + len(pending_returns))
             
             st.divider()
             
@@ -166,7 +182,6 @@ if st.session_state.view_mode == "admin":
             # Filter pending requests
             # pending dataframe holds BORROW_REQUESTED
             pending_lends = pending
-            pending_returns = transactions[transactions['status'] == 'RETURN_REQUESTED']
             
             q_tab1, q_tab2 = st.tabs([f"Lend Requests ({len(pending_lends)})", f"Return Requests ({len(pending_returns)})"])
             
@@ -242,27 +257,17 @@ if st.session_state.view_mode == "admin":
             t_tab1, t_tab2 = st.tabs(["Active Loans", "All Transactions"])
             
             with t_tab1:
-                col_search1, col_search2 = st.columns(2)
+                col_search1, col_search2, col_sort = st.columns([2, 2, 1])
                 with col_search1:
                      s_loan_book = st.text_input("Search Book Title/ID", key="s_loan_book")
                 with col_search2:
                      s_loan_user = st.text_input("Search User Name/Mobile", key="s_loan_user")
+                with col_sort:
+                     s_loan_order = st.selectbox("Sort by", list(LOAN_ORDERS), key="s_loan_order")
                 
-                active_loans = transactions[transactions['status'] == 'ACTIVE']
-                
-                # Apply filters
-                if s_loan_book:
-                    active_loans = active_loans[
-                        active_loans['book_title'].str.contains(s_loan_book, case=False, na=False) |
-                        active_loans['book_id'].str.contains(s_loan_book, case=False, na=False)
-                    ]
-                if s_loan_user:
-                    active_loans = active_loans[
-                        active_loans['user_name'].str.contains(s_loan_user, case=False, na=False) |
-                        active_loans['user_mobile'].astype(str).str.contains(s_loan_user, case=False, na=False)
-                    ]
-                
-                # ... (Search filters logic) ...
+                # Search and sort the active loans (served from the loan index)
+                order, descending = LOAN_ORDERS[s_loan_order]
+                active_loans = dm.search_active_loans(s_loan_book, s_loan_user, order, descending)
                 
                 # We need user_id to perform updates, so include it in data but maybe configure column to be read-only or hidden
                 result_active = active_loans[['transaction_id', 'book_title', 'user_id', 'user_name', 'user_mobile', 'borrow_date']].copy()
@@ -306,18 +311,19 @@ if st.session_state.view_mode == "admin":
             with t_tab2:
                 # All Transactions Editor
                 st.write("Double-click **User Mobile** to update.")
-                # Ensure all cols are present
+                # Ensure all cols are present (but not the internal lookup keys)
+                all_tx = dm.SCHEMAS['transactions'].shown(transactions)
                 
                 edited_all_tx = st.data_editor(
-                    transactions,
+                    all_tx,
                     use_container_width=True,
                     key="editor_all_tx",
-                    disabled=[c for c in transactions.columns if c != 'user_mobile']
+                    disabled=[c for c in all_tx.columns if c != 'user_mobile']
                 )
                 
-                if not transactions.equals(edited_all_tx):
+                if not all_tx.equals(edited_all_tx):
                      for index, row in edited_all_tx.iterrows():
-                        original_row = transactions.loc[index]
+                        original_row = all_tx.loc[index]
                         if str(row['user_mobile']) != str(original_row['user_mobile']):
                             user_id = row['user_id']
                             new_mobile = row['user_mobile']
@@ -454,13 +460,7 @@ if st.session_state.view_mode == "admin":
             admin_book_search = st_keyup("Search Inventory (Real-Time)", key="admin_book_search")
             
             if admin_book_search:
-                filtered_books = books[
-                    books['title'].str.contains(admin_book_search, case=False, na=False) |
-                    books['author'].str.contains(admin_book_search, case=False, na=False) |
-                    books['id'].str.contains(admin_book_search, case=False, na=False) |
-                    books['title_thanglish'].str.contains(admin_book_search, case=False, na=False) |
-                    books['author_thanglish'].str.contains(admin_book_search, case=False, na=False)
-                ]
+                filtered_books = dm.search_books(admin_book_search, cache=st.session_state['book_search_cache'])
                 st.dataframe(filtered_books, use_container_width=True)
             else:
                 st.dataframe(books, use_container_width=True)
@@ -559,15 +559,11 @@ if st.session_state.view_mode == "admin":
             member_search = st_keyup("Search Members", key="admin_mem_search")
             
             if member_search:
-                filtered_users = users[
-                    users['name'].str.contains(member_search, case=False, na=False) |
-                    users['mobile'].astype(str).str.contains(member_search, case=False, na=False) |
-                    users['email'].str.contains(member_search, case=False, na=False) |
-                    users['user_id'].str.contains(member_search, case=False, na=False)
-                ]
-                st.dataframe(filtered_users, use_container_width=True)
+                # Name/email contain it, ID starts with it, or mobile starts/ends with its digits
+                filtered_users = dm.search_members(member_search)
+                st.dataframe(dm.SCHEMAS['users'].shown(filtered_users), use_container_width=True)
             else:
-                st.dataframe(users, use_container_width=True)
+                st.dataframe(dm.SCHEMAS['users'].shown(users), use_container_width=True)
 
         with tab4:
             st.header("Database Management")
@@ -580,6 +576,14 @@ if st.session_state.view_mode == "admin":
                 else:
                     st.error(msg)
 
+            st.write("Lends and returns are appended to a journal. Compact it before editing `transactions.xlsx` by hand.")
+            if st.button("Compact Transaction Journal"):
+                success, msg = dm.compact_journal()
+                if success:
+                    st.success(msg)
+                else:
+                    st.error(msg)
+
 # --- USER PORTAL ---
 elif st.session_state.view_mode == "user":
     st.title("வாசகர் வட்டம் / Bibliophiles📚📖")
@@ -604,67 +608,113 @@ elif st.session_state.view_mode == "user":
     if st.session_state['user_view'] == 'browse':
         st.subheader("Browse Books")
         st.caption("Search and lend books instantly.")
-        books, _, _, _ = dm.load_data()
         
         # Search & Filter
         c_title, c_author, c_filter = st.columns([2, 2, 1])
         with c_title:
             search_title = st_keyup("Search Title / ID", key="search_title_input")
+            if search_title:
+                suggestions = dm.suggest_books(search_title, ('title', 'title_thanglish'))
+                if suggestions:
+                    st.caption("Suggestions: " + " · ".join(suggestions))
         with c_author:
             search_author = st_keyup("Search Author", key="search_author_input")
+            if search_author:
+                suggestions = dm.suggest_books(search_author, ('author', 'author_thanglish'))
+                if suggestions:
+                    st.caption("Suggestions: " + " · ".join(suggestions))
         with c_filter:
             filter_opt = st.selectbox("Show", ["All Books", "Available Only"])
+            fuzzy = st.checkbox("Sounds like", help="Match Tanglish spellings loosely, best match first")
+            layout = st.radio("View", list(BROWSE_PAGE_SIZE), horizontal=True,
+                              help="Table is quicker for long result lists")
+        page_size = BROWSE_PAGE_SIZE[layout]
+
+        # Pages: a stack of cursors, one per page reached; a new search starts over
+        browse_query = (search_title, search_author, filter_opt, fuzzy, layout)
+        if st.session_state.get('browse_query') != browse_query:
+            st.session_state['browse_query'] = browse_query
+            st.session_state['browse_cursors'] = [None]
+        cursors = st.session_state['browse_cursors']
             
         # Apply Logic
-        display_books = books
-        # Ensure ID is string for search
-        display_books['id'] = display_books['id'].astype(str)
-        
-        if search_title:
-            display_books = display_books[
-                display_books['title'].str.contains(search_title, case=False, na=False) |
-                display_books['title_thanglish'].str.contains(search_title, case=False, na=False) |
-                display_books['id'].str.contains(search_title, case=False, na=False)
-            ]
-            
-        if search_author:
-            display_books = display_books[
-                display_books['author'].str.contains(search_author, case=False, na=False) |
-                display_books['author_thanglish'].str.contains(search_author, case=False, na=False)
-            ]
-
-        if filter_opt == "Available Only":
-            display_books = display_books[display_books['status'] == 'AVAILABLE']
-        
-        # Priority Sort: Available First, then Title Ascending
-        display_books['sort_order'] = display_books['status'].apply(lambda x: 0 if x == 'AVAILABLE' else 1)
-        display_books = display_books.sort_values(by=['sort_order', 'title'], ascending=[True, True])
+        available_only = filter_opt == "Available Only"
+        if fuzzy and (search_title or search_author):
+            # Sounds-like matches stay best first (a short list: pages by offset)
+            if search_author:
+                by_author = dm.search_books_fuzzy(search_author, ('author_thanglish',))
+            if not search_title:
+                display_books = by_author
+            else:
+                # Both boxes: keep the title ranking, narrowed to the author's matches
+                display_books = dm.search_books_fuzzy(search_title, ('title_thanglish',))
+                if search_author:
+                    display_books = display_books[display_books.index.isin(by_author.index)]
+            if available_only:
+                display_books = display_books[display_books['status'] == 'AVAILABLE']
+            total = len(display_books)
+            offset = cursors[-1] or 0
+            display_books = display_books.iloc[offset:offset + page_size]
+            next_cursor = offset + page_size if offset + page_size < total else None
+        else:
+            # Best matches first (exact ID, title prefix, whole word, ...), available before lent
+            display_books, total, next_cursor = dm.rank_books(
+                search_title, search_author, available_only, k=page_size,
+                cache=st.session_state['book_search_cache'], after=cursors[-1])
 
-        # Limit if no search to avoid lag, but allow full list if filtered
-        if not search_title and not search_author and filter_opt == "All Books":
-             display_books = display_books.head(50)
-             st.caption("Showing first 50 items (Available first). Use search for more.")
+        first = (len(cursors) - 1) * page_size
+        if total > len(display_books):
+            st.caption(f"Showing {first + 1}–{first + len(display_books)} of {total} books.")
         else:
-             st.caption(f"Found {len(display_books)} books.")
+            st.caption(f"Found {total} books.")
         
-        # Grid
-        for index, row in display_books.iterrows():
-            with st.container():
-                c1, c2, c3, c4 = st.columns([3, 3, 2, 2])
-                c1.write(f"**{row['title']}**")
-                c1.caption(f"ID: {row['id']}")
-                c2.write(f"*{row['author']}*")
-                
-                status = row['status']
-                if status == 'AVAILABLE':
-                    c3.success(status)
-                    if c4.button("📚 Lend", key=f"btn_{row['id']}"):
+        # Grid: only the current page is rendered
+        if layout == "Table":
+            table = st.dataframe(display_books[['id', 'title', 'author', 'status']],
+                                 use_container_width=True, hide_index=True,
+                                 on_select="rerun", selection_mode="single-row",
+                                 key=f"browse_table_{len(cursors)}")
+            selected = [i for i in table.selection.rows if i < len(display_books)]
+            if selected:
+                row = display_books.iloc[selected[0]]
+                c1, c2 = st.columns([4, 1])
+                c1.write(f"**{row['title']}** ({row['id']}), *{row['author']}*")
+                if row['status'] == 'AVAILABLE':
+                    if c2.button("📚 Lend", key=f"btn_{row['id']}"):
                         lend_dialog(row['id'], row['title'])
-                else:
-                    c3.error(status)
-                    if c4.button("⭐ Interested", key=f"int_{row['id']}"):
-                        interest_dialog(row['id'], row['title'])
-                st.divider()
+                elif c2.button("⭐ Interested", key=f"int_{row['id']}"):
+                    interest_dialog(row['id'], row['title'])
+            else:
+                st.caption("Select a row to lend the book or register interest.")
+        else:
+            for index, row in display_books.iterrows():
+                with st.container():
+                    c1, c2, c3, c4 = st.columns([3, 3, 2, 2])
+                    c1.write(f"**{row['title']}**")
+                    c1.caption(f"ID: {row['id']}")
+                    c2.write(f"*{row['author']}*")
+                    
+                    status = row['status']
+                    if status == 'AVAILABLE':
+                        c3.success(status)
+                        if c4.button("📚 Lend", key=f"btn_{row['id']}"):
+                            lend_dialog(row['id'], row['title'])
+                    else:
+                        c3.error(status)
+                        if c4.button("⭐ Interested", key=f"int_{row['id']}"):
+                            interest_dialog(row['id'], row['title'])
+                    st.divider()
+
+        # Page navigation
+        if len(cursors) > 1 or next_cursor is not None:
+            c_prev, c_page, c_next = st.columns([1, 2, 1])
+            if c_prev.button("◀ Previous", disabled=len(cursors) == 1, use_container_width=True):
+                cursors.pop()
+                st.rerun()
+            c_page.caption(f"Page {len(cursors)} of {max(-(-total // page_size), len(cursors))}")
+            if c_next.button("Next ▶", disabled=next_cursor is None, use_container_width=True):
+                cursors.append(next_cursor)
+                st.rerun()
 
     # --- VIEW: MY ACCOUNT ---
     elif st.session_state['user_view'] == 'account':
@@ -0,0 +1,82 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+# Browse ranking benchmark: the browse view's search, then a sort_order column
+# from .apply() and sort_values() over every match before head(50), vs.
+# data_manager.rank_books() scoring the matches and sorting only the top 50,
+# and fetching the next page from its cursor, on a copy of data/ with N synthetic books.
+#
+#   python bench_browse.py [N]      (default 100000)
+
+SOURCE_DATA_DIR = os.path.abspath("data")
+QUERIES = [("", ""), ("book", ""), ("book 12", ""), ("GDL-042", ""), ("", "author 4"),
+           ("book 7", "author 1")]
+REPEAT = 5
+
+def make_books(data_dir, num_books):
+    pd.DataFrame({
+        'id': [f"GDL-{i:03d}" for i in range(1, num_books + 1)],
+        'title': [f"Book {i}" for i in range(num_books)],
+        'author': [f"Author {i % 500}" for i in range(num_books)],
+        'donated_by': "",
+        'status': ['LENT' if i % 3 == 0 else 'AVAILABLE' for i in range(num_books)],
+        'title_thanglish': "",
+        'author_thanglish': "",
+    }).to_excel(os.path.join(data_dir, "books.xlsx"), index=False)
+
+def per_call_ms(func):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        result = func()
+    return (time.perf_counter() - start) / REPEAT * 1000, result
+
+def main():
+    num_books = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    work_dir = tempfile.mkdtemp(prefix="library-bench-")
+    try:
+        shutil.copytree(SOURCE_DATA_DIR, os.path.join(work_dir, "data"))
+        make_books(os.path.join(work_dir, "data"), num_books)
+        os.chdir(work_dir)  # data_manager resolves data/ relative to the cwd
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import data_manager as dm
+
+        def filter_then_sort(title_query, author_query):
+            books = dm.get_books()
+            if title_query:
+                books = dm.search_books(title_query, dm.TITLE_SEARCH)
+            if author_query:
+                by_author = dm.search_books(author_query, dm.AUTHOR_SEARCH)
+                books = books[books.index.isin(by_author.index)]
+            books['sort_order'] = books['status'].apply(lambda x: 0 if x == 'AVAILABLE' else 1)
+            books = books.sort_values(by=['sort_order', 'title'], ascending=[True, True])
+            return books.head(dm.RESULTS_PER_PAGE), len(books)
+
+        for title_query, author_query in QUERIES:  # warm the snapshot and search indexes
+            dm.rank_books(title_query, author_query)
+        print(f"{num_books} books")
+        print(f"{'title query':>12} {'author query':>12} {'matches':>8} {'sort all ms':>12} "
+              f"{'top-k ms':>9} {'next page ms':>13}")
+        for title_query, author_query in QUERIES:
+            sort_ms, (_, total) = per_call_ms(
+                lambda: filter_then_sort(title_query, author_query))
+            rank_ms, (top, matches, cursor) = per_call_ms(
+                lambda: dm.rank_books(title_query, author_query))
+            assert matches == total and len(top) == min(total, dm.RESULTS_PER_PAGE)
+            next_ms = 0.0
+            if cursor is not None:
+                next_ms, (page, _, _) = per_call_ms(
+                    lambda: dm.rank_books(title_query, author_query, after=cursor))
+                assert not set(page['id']) & set(top['id'])
+            print(f"{title_query:>12} {author_query:>12} {total:8d} {sort_ms:12.1f} {rank_ms:9.1f} "
+                  f"{next_ms:13.1f}")
+    finally:
+        os.chdir(os.path.dirname(SOURCE_DATA_DIR))
+        shutil.rmtree(work_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+# Burst-of-approvals benchmark for the writer queue.
+#
+# Creates N lend requests on a copy of data/, then approves them all at once
+# from N threads (one per "volunteer"), first with group commit disabled
+# (max_batch=1, every approval is its own batch) and then with the defaults.
+#
+#   python bench_group_commit.py [N]
+
+SOURCE_DATA_DIR = os.path.abspath("data")
+
+def run_burst(dm, n, window, max_batch):
+    books = dm.get_books()
+    available = books[books['status'] == 'AVAILABLE']['id'].tolist()[:n]
+    for i, book_id in enumerate(available):
+        dm.lend_book_request(book_id, f"Bench {i}", str(9100000000 + i), "")
+    pending = dm.get_pending()
+    tx_ids = pending[pending['status'] == 'BORROW_REQUESTED']['transaction_id'].tolist()
+
+    dm.WRITE_QUEUE.window = window
+    dm.WRITE_QUEUE.max_batch = max_batch
+    dm.WRITE_QUEUE.reset_stats()
+    barrier = threading.Barrier(len(tx_ids))
+
+    def volunteer(tx_id):
+        barrier.wait()
+        dm.approve_lend(tx_id)
+
+    threads = [threading.Thread(target=volunteer, args=(tx_id,)) for tx_id in tx_ids]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    stats = dm.write_stats()
+
+    # Return the books so the next run starts from the same state
+    dm.WRITE_QUEUE.window = 0
+    for tx_id in tx_ids:
+        dm.approve_return(tx_id)
+    return elapsed, len(tx_ids), stats
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    work_dir = tempfile.mkdtemp(prefix="library-bench-")
+    try:
+        shutil.copytree(SOURCE_DATA_DIR, os.path.join(work_dir, "data"))
+        os.chdir(work_dir)  # data_manager resolves data/ relative to the cwd
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import data_manager as dm
+
+        window, max_batch = dm.WRITE_QUEUE.window, dm.WRITE_QUEUE.max_batch
+        runs = [("no coalescing", 0, 1), (f"window {window * 1000:.0f} ms", window, max_batch)]
+        for label, window, max_batch in runs:
+            elapsed, ops, stats = run_burst(dm, n, window, max_batch)
+            print(f"{label:>16}: {ops} approvals in {elapsed * 1000:7.1f} ms "
+                  f"({ops / elapsed:6.1f}/s)  batches={stats['batches']} "
+                  f"mean batch={stats['mean_batch']:.1f}  "
+                  f"p50={stats['p50_ms']:.1f} ms  p95={stats['p95_ms']:.1f} ms")
+    finally:
+        os.chdir(os.path.dirname(SOURCE_DATA_DIR))
+        shutil.rmtree(work_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+from storage import Insert, Update
+
+# Point-lookup benchmark: member by mobile / by ID, book by ID, a book's active
+# loan and a member's open records (get_user_history), as a scan (how
+# data_manager used to look them up) vs. through the hash indexes, and the
+# Manage Members search box as four str.contains scans vs. the member index,
+# and the dashboard's active-loan search as the ACTIVE filter and str.contains
+# scans vs. the loan index, on a copy of data/ with N synthetic members, books
+# and transactions.
+#
+#   python bench_lookups.py [N]      (default 50000)
+
+SOURCE_DATA_DIR = os.path.abspath("data")
+LOOKUPS = 200
+MEMBER_SEARCHES = ["Member 4242", "member 12", "MEM-01", "mem-424", "42", "900001", "2345",
+                   "example.com"]
+LOAN_SEARCHES = [("Book 4", ""), ("GDL-12", ""), ("", "Member 42"), ("", "900001"),
+                 ("bo", "me"), ("zzz", "")]
+
+def make_tables(data_dir, num_members):
+    pd.DataFrame({
+        'id': [f"GDL-{i:03d}" for i in range(1, num_members + 1)],
+        'title': [f"Book {i}" for i in range(num_members)],
+        'author': [f"Author {i % 500}" for i in range(num_members)],
+        'donated_by': "",
+        'status': 'AVAILABLE',
+        'title_thanglish': "",
+        'author_thanglish': "",
+    }).to_excel(os.path.join(data_dir, "books.xlsx"), index=False)
+    pd.DataFrame({
+        'user_id': [f"MEM-{i:03d}" for i in range(1, num_members + 1)],
+        'name': [f"Member {i}" for i in range(num_members)],
+        'email': [f"member{i}@example.com" for i in range(num_members)],
+        'mobile': [str(9000000000 + i) for i in range(num_members)],
+        'role': 'USER',
+    }).to_excel(os.path.join(data_dir, "users.xlsx"), index=False)
+    pd.DataFrame({
+        'transaction_id': [f"TX-{i:08d}" for i in range(num_members)],
+        'book_id': [f"GDL-{i + 1:03d}" for i in range(num_members)],
+        'book_title': [f"Book {i}" for i in range(num_members)],
+        'user_id': [f"MEM-{(i * 7) % num_members + 1:03d}" for i in range(num_members)],
+        'user_name': [f"Member {(i * 7) % num_members}" for i in range(num_members)],
+        'user_email': "",
+        'user_mobile': [str(9000000000 + (i * 7) % num_members) for i in range(num_members)],
+        'borrow_date': "2026-01-01",
+        'return_date': "",
+        'status': ['ACTIVE' if i % 10 == 0 else 'RETURNED' for i in range(num_members)],
+    }).to_excel(os.path.join(data_dir, "transactions.xlsx"), index=False)
+    for name in ("transactions.journal", "pending_approvals.xlsx"):
+        if os.path.exists(os.path.join(data_dir, name)):
+            os.remove(os.path.join(data_dir, name))
+
+def scan_history(dm, identifier):
+    """get_user_history as it was: a Python match over every open record."""
+    check_mobile = dm.normalize_mobile(identifier)
+    check_id = str(identifier).strip().upper()
+    check_name = str(identifier).strip().lower()
+
+    def match_row(row):
+        return ((check_mobile and dm.normalize_mobile(row['user_mobile']) == check_mobile)
+                or str(row['user_id']).strip().upper() == check_id
+                or str(row['user_name']).strip().lower() == check_name)
+
+    transactions, pending = dm.get_transactions(), dm.get_pending()
+    active = transactions[transactions['status'].isin(['ACTIVE', 'RETURN_REQUESTED'])]
+    borrows = pending[pending['status'] == 'BORROW_REQUESTED']
+    return [row.to_dict() for df in (active, borrows) for _, row in df.iterrows()
+            if match_row(row)]
+
+def per_call_us(func, args):
+    start = time.perf_counter()
+    for arg in args:
+        func(arg)
+    return (time.perf_counter() - start) / len(args) * 1e6
+
+def main():
+    num_members = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    work_dir = tempfile.mkdtemp(prefix="library-bench-")
+    try:
+        shutil.copytree(SOURCE_DATA_DIR, os.path.join(work_dir, "data"))
+        make_tables(os.path.join(work_dir, "data"), num_members)
+        os.chdir(work_dir)  # data_manager resolves data/ relative to the cwd
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import data_manager as dm
+
+        step = max(num_members // LOOKUPS, 1)
+        mobiles = [str(9000000000 + i) for i in range(0, num_members, step)]
+        member_ids = [f"mem-{i + 1:03d}" for i in range(0, num_members, step)]
+        book_ids = [f"GDL-{i + 1:03d}" for i in range(0, num_members, step)]
+
+        def scan_mobile(mobile):
+            users = dm.get_users()
+            user = users[users['mobile'].apply(dm.normalize_mobile) == dm.normalize_mobile(mobile)]
+            return user.iloc[0].to_dict() if not user.empty else None
+
+        def scan_member_id(user_id):
+            users = dm.get_users()
+            user = users[users['user_id'].str.upper() == str(user_id).upper()]
+            return user.iloc[0].to_dict() if not user.empty else None
+
+        def scan_book(book_id):
+            books = dm._load_table('books')
+            return books[books['id'] == book_id]
+
+        def indexed_book(book_id):
+            books = dm._load_table('books')
+            return books.loc[dm._rows('books', books, 'id', book_id)]
+
+        def scan_active_loan(book_id):
+            transactions = dm.get_transactions()
+            return transactions[(transactions['book_id'] == book_id)
+                                & (transactions['status'] == 'ACTIVE')]
+
+        def indexed_active_loan(book_id):
+            transactions = dm.get_transactions()
+            return transactions.iloc[dm._find('transactions', transactions,
+                                              ('book_id', 'status'), (book_id, 'ACTIVE'))]
+
+        dm.get_member_by_mobile(mobiles[0])  # cold: read users and build the index
+        users = dm._load_table('users')
+        start = time.perf_counter()
+        dm._build_index('users', users)
+        print(f"members/books: {num_members}, member index build: "
+              f"{(time.perf_counter() - start) * 1000:.0f} ms (once per cold read)")
+
+        cases = [
+            ("member by mobile", scan_mobile, dm.get_member_by_mobile, mobiles),
+            ("member by ID", scan_member_id, dm.get_member_by_id, member_ids),
+            ("book by ID", scan_book, indexed_book, book_ids),
+            ("active loan", scan_active_loan, indexed_active_loan, book_ids),
+            ("user history", lambda m: scan_history(dm, m), dm.get_user_history, mobiles[:20]),
+        ]
+        for label, scan, indexed, args in cases:
+            assert [str(scan(a)) for a in args[:5]] == [str(indexed(a)) for a in args[:5]]
+            before, after = per_call_us(scan, args), per_call_us(indexed, args)
+            print(f"{label:>17}: scan {before:9.1f} us   indexed {after:7.1f} us   "
+                  f"({before / after:5.0f}x)")
+
+        def scan_members(query):
+            users = dm.get_users()
+            return users[users['name'].str.contains(query, case=False, na=False)
+                         | users['mobile'].astype(str).str.contains(query, case=False, na=False)
+                         | users['email'].str.contains(query, case=False, na=False)
+                         | users['user_id'].str.contains(query, case=False, na=False)]
+
+        dm.search_members(MEMBER_SEARCHES[0])  # build the member index
+        print(f"{'member search':>17} {'scan hits':>9} {'index hits':>10} {'scan ms':>8} "
+              f"{'index ms':>8}")
+        for query in MEMBER_SEARCHES:
+            scanned, found = scan_members(query), dm.search_members(query)
+            # IDs match by prefix and mobiles at either end: a subset of "contains"
+            assert set(found['user_id']) <= set(scanned['user_id']), query
+            before, after = per_call_us(scan_members, [query] * 5), per_call_us(
+                dm.search_members, [query] * 5)
+            print(f"{query:>17} {len(scanned):9d} {len(found):10d} {before / 1000:8.1f} "
+                  f"{after / 1000:8.2f}")
+
+        def scan_loans(book_query, user_query):
+            loans = dm.get_transactions_by_status('ACTIVE')
+            if book_query:
+                loans = loans[loans['book_title'].str.contains(book_query, case=False, na=False)
+                              | loans['book_id'].str.contains(book_query, case=False, na=False)]
+            if user_query:
+                loans = loans[loans['user_name'].str.contains(user_query, case=False, na=False)
+                              | loans['user_mobile'].astype(str).str.contains(
+                                  user_query, case=False, na=False)]
+            return loans
+
+        transactions = dm._load_table('transactions')
+        start = time.perf_counter()
+        loans = dm._build_index('transactions', transactions, 'loans')
+        print(f"active loans: {len(loans.search('', ()))}, loan index build: "
+              f"{(time.perf_counter() - start) * 1000:.0f} ms (once per cold read)")
+        # What a commit does to it after approve_lend and approve_return
+        lent = {**transactions.iloc[0].to_dict(), 'transaction_id': 'TX-NEW', 'status': 'ACTIVE'}
+        changes = [Insert([lent]), Update({'transaction_id': transactions['transaction_id'].iat[0]},
+                                          {'status': 'RETURNED'})]
+        start = time.perf_counter()
+        for _ in range(LOOKUPS):
+            assert loans.copy().apply(changes, len(transactions) + 1)
+        print(f"loan index copy + apply(lend, return): "
+              f"{(time.perf_counter() - start) / LOOKUPS * 1e6:.0f} us")
+
+        dm.search_active_loans()  # build the loan index
+        print(f"{'loan search':>17} {'hits':>6} {'scan ms':>8} {'index ms':>8}")
+        for book_query, user_query in LOAN_SEARCHES:
+            scanned = scan_loans(book_query, user_query)
+            found = dm.search_active_loans(book_query, user_query)
+            assert sorted(found['transaction_id']) == sorted(scanned['transaction_id'])
+            before = per_call_us(lambda q: scan_loans(*q), [(book_query, user_query)] * 5)
+            after = per_call_us(lambda q: dm.search_active_loans(*q), [(book_query, user_query)] * 5)
+            query = f"{book_query}/{user_query}"
+            print(f"{query:>17} {len(found):6d} {before / 1000:8.1f} {after / 1000:8.2f}")
+    finally:
+        os.chdir(os.path.dirname(SOURCE_DATA_DIR))
+        shutil.rmtree(work_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import sys
+import time
+
+import pandas as pd
+import compact
+from schema import SCHEMAS
+
+# Memory report for LIBRARY_COMPACT=1 on a synthetic catalog.
+#
+#   python bench_memory.py [num_books]      (default 100000)
+#
+# Compares bytes per row of the cached tables as Python object strings (what
+# pandas < 3 produced), as this pandas' default strings, and in compact form,
+# plus the cost of handing a compact table out (formatting the IDs back).
+
+def synthetic_tables(num_books):
+    books = pd.DataFrame({
+        'id': [f"GDL-{i:03d}" for i in range(1, num_books + 1)],
+        'title': [f"பொன்னியின் செல்வன் பாகம் {i}" for i in range(num_books)],
+        'author': [f"கல்கி {i % 2000}" for i in range(num_books)],
+        'donated_by': ["" for _ in range(num_books)],
+        'status': ['AVAILABLE' if i % 5 else 'LENT' for i in range(num_books)],
+        'title_thanglish': [f"ponniyin selvan paakam {i}" for i in range(num_books)],
+        'author_thanglish': [f"kalki {i % 2000}" for i in range(num_books)],
+    })
+    num_tx = num_books // 2
+    transactions = pd.DataFrame({
+        'transaction_id': [f"TX-{20260101000000 + i}" for i in range(num_tx)],
+        'book_id': books['id'].iloc[:num_tx].values,
+        'book_title': books['title'].iloc[:num_tx].values,
+        'user_id': [f"MEM-{i % 5000 + 1:03d}" for i in range(num_tx)],
+        'user_name': [f"Member {i % 5000}" for i in range(num_tx)],
+        'user_email': "",
+        'user_mobile': [str(9000000000 + i % 5000) for i in range(num_tx)],
+        'borrow_date': "2026-01-01",
+        'return_date': None,
+        'status': ['ACTIVE' if i % 3 else 'RETURNED' for i in range(num_tx)],
+    })
+    return {'books': books, 'transactions': transactions}
+
+def main():
+    num_books = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    tables = synthetic_tables(num_books)
+
+    variants = {
+        'object strings': {t: df.astype(object) for t, df in tables.items()},
+        'default strings': {t: SCHEMAS[t].conform(df) for t, df in tables.items()},
+    }
+    variants['compact'] = {t: compact.compact(t, df) for t, df in variants['default strings'].items()}
+
+    reports = {name: compact.memory_report(frames) for name, frames in variants.items()}
+    print(f"Bytes per row ({num_books} books, {num_books // 2} transactions)")
+    print(f"{'':>18}" + "".join(f"{t:>14}" for t in tables))
+    for name, report in reports.items():
+        print(f"{name:>18}" + "".join(f"{report[t][1]:14.1f}" for t in tables))
+
+    for table, df in variants['compact'].items():
+        start = time.perf_counter()
+        compact.expand(table, df)
+        print(f"expand({table}): {(time.perf_counter() - start) * 1000:.1f} ms per hand-out")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import sys
+import time
+
+import pandas as pd
+from schema import SCHEMAS
+from search_index import NgramIndex, SearchCache
+from phonetic_index import PhoneticIndex, phonetic_key
+from tamil_index import GraphemeIndex, grapheme_text
+from suggest_index import SuggestIndex, phrase, word_starts
+from storage import Insert, Update
+
+# Catalog search benchmark: the five str.contains scans the search boxes used
+# to run on every keystroke vs. the n-gram index (search_index.py), and fuzzy
+# Tanglish search scoring every row vs. the phonetic index (phonetic_index.py),
+# and Tamil-script queries scanned by grapheme vs. the grapheme index
+# (tamil_index.py), and autocomplete by scan vs. the suggestion index
+# (suggest_index.py), on a synthetic catalog of Tamil titles with Tanglish forms.
+#
+#   python bench_search.py [num_books]      (default 100000)
+
+FIELDS = ('title', 'author', 'id', 'title_thanglish', 'author_thanglish')
+QUERIES = ['p', 'po', 'pon', 'ponn', 'ponni', 'paakam 12', 'kalki 19', 'GDL-420',
+           'பொன்', 'பாகம் 777', 'zzz']
+REPEAT = 5
+TYPED = ['ponniyin selvan', 'kalki 19', 'title 4242', 'பொன்னியின்']
+FUZZY_FIELDS = ('title_thanglish', 'author_thanglish')
+FUZZY = ['poniyan selvam paagam 420', 'kalky 1999', 'paarthiban kanavu']
+TAMIL_FIELDS = ('title', 'author')
+TAMIL = ['பொ', 'பொன்னியின்', 'பாகம் 42', 'கல்கி 19', 'செ\u0bbeல்']
+SUGGEST_FIELDS = ('title', 'author', 'title_thanglish', 'author_thanglish')
+SUGGEST = ['p', 'pon', 'ponniyin selvan paakam 4', 'kalki 1', 'selvan', 'பொ', 'கல்கி 19']
+
+def synthetic_books(num_books):
+    return SCHEMAS['books'].conform(pd.DataFrame({
+        'id': [f"GDL-{i:03d}" for i in range(1, num_books + 1)],
+        'title': [f"பொன்னியின் செல்வன் பாகம் {i}" if i % 4 == 0
+                  else f"Title {i} of the series" for i in range(num_books)],
+        'author': [f"கல்கி {i % 2000}" for i in range(num_books)],
+        'donated_by': "",
+        'status': 'AVAILABLE',
+        'title_thanglish': [f"ponniyin selvan paakam {i}" if i % 4 == 0 else ""
+                            for i in range(num_books)],
+        'author_thanglish': [f"kalki {i % 2000}" for i in range(num_books)],
+    }))
+
+def scan(books, query):
+    found = pd.Series(False, index=books.index)
+    for field in FIELDS:
+        found |= books[field].str.contains(query, case=False, regex=False, na=False)
+    return books.index[found].tolist()
+
+def type_with_cache(index, prefixes):
+    cache = SearchCache()  # a fresh session
+    return [cache.search(index, 1, prefix, FIELDS) for prefix in prefixes]
+
+def per_call_ms(func):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        result = func()
+    return (time.perf_counter() - start) / REPEAT * 1000, result
+
+def main():
+    num_books = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    books = synthetic_books(num_books)
+
+    start = time.perf_counter()
+    index = NgramIndex.build(books, 'id', FIELDS)
+    print(f"{num_books} books, index build: {(time.perf_counter() - start) * 1000:.0f} ms "
+          f"(once per cold read)")
+
+    print(f"{'query':>12} {'matches':>8} {'scan ms':>9} {'index ms':>9}")
+    for query in QUERIES:
+        scan_ms, expected = per_call_ms(lambda: scan(books, query))
+        index_ms, found = per_call_ms(lambda: index.search(query, FIELDS))
+        assert found == expected, query
+        print(f"{query:>12} {len(found):8d} {scan_ms:9.2f} {index_ms:9.2f}")
+
+    # Typing a query one keystroke at a time, each a search (st_keyup reruns)
+    print(f"{'typed':>16} {'scan ms':>9} {'index ms':>9} {'cached ms':>10} {'rerun ms':>9}"
+          f"   (per keystroke)")
+    for typed in TYPED:
+        prefixes = [typed[:i] for i in range(1, len(typed) + 1)]
+        scan_ms = per_call_ms(lambda: [scan(books, p) for p in prefixes])[0]
+        index_ms = per_call_ms(lambda: [index.search(p, FIELDS) for p in prefixes])[0]
+        cached_ms, found = per_call_ms(lambda: type_with_cache(index, prefixes))
+        assert found == [index.search(p, FIELDS) for p in prefixes], typed
+        cache = SearchCache()
+        cache.search(index, 1, typed, FIELDS)
+        rerun_ms = per_call_ms(lambda: cache.search(index, 1, typed, FIELDS))[0]
+        print(f"{typed:>16} {scan_ms / len(prefixes):9.2f} {index_ms / len(prefixes):9.2f} "
+              f"{cached_ms / len(prefixes):10.2f} {rerun_ms:9.3f}")
+
+    # Fuzzy: every row scored and sorted vs. skeleton candidates and a k-heap
+    start = time.perf_counter()
+    phonetic = PhoneticIndex.build(books, 'id', FUZZY_FIELDS)
+    print(f"phonetic index build: {(time.perf_counter() - start) * 1000:.0f} ms")
+    print(f"{'fuzzy query':>26} {'all rows ms':>12} {'index ms':>9}")
+    for query in FUZZY:
+        words = phonetic_key(query).split()
+
+        def score_all():
+            distances = {}
+            scored = (phonetic._score(words, FUZZY_FIELDS, pos, distances)
+                      for pos in range(phonetic.rows))
+            return [pos for _, pos in sorted(s for s in scored if s is not None)[:50]]
+
+        all_ms, expected = per_call_ms(score_all)
+        index_ms, found = per_call_ms(lambda: phonetic.ranked(query, FUZZY_FIELDS))
+        assert found[:1] == expected[:1], query
+        print(f"{query:>26} {all_ms:12.1f} {index_ms:9.2f}")
+
+    # Tamil script: matched by grapheme cluster on NFC text
+    start = time.perf_counter()
+    graphemes = GraphemeIndex.build(books, 'id', TAMIL_FIELDS)
+    print(f"grapheme index build: {(time.perf_counter() - start) * 1000:.0f} ms")
+    print(f"{'tamil query':>12} {'matches':>8} {'scan ms':>9} {'index ms':>9}")
+    forms = {f: books[f].map(grapheme_text) for f in TAMIL_FIELDS}
+    for query in TAMIL:
+        def scan_graphemes():
+            found = pd.Series(False, index=books.index)
+            for field in TAMIL_FIELDS:
+                found |= forms[field].str.contains(graphemes.prepare(query)[0], regex=False)
+            return books.index[found].tolist()
+
+        scan_ms, expected = per_call_ms(scan_graphemes)
+        index_ms, found = per_call_ms(lambda: graphemes.search(query, TAMIL_FIELDS))
+        assert found == expected, query
+        print(f"{query:>12} {len(found):8d} {scan_ms:9.2f} {index_ms:9.2f}")
+
+    # Autocomplete: weigh every matching text vs. bisect into the word starts
+    loans = {f"GDL-{i:03d}": i % 7 for i in range(1, num_books + 1)}
+    start = time.perf_counter()
+    suggestions = SuggestIndex.build(books, 'id', SUGGEST_FIELDS, loans)
+    print(f"suggestion index build: {(time.perf_counter() - start) * 1000:.0f} ms")
+    print(f"{'prefix':>26} {'scan ms':>9} {'index ms':>9}")
+    texts = {f: books[f].map(phrase) for f in SUGGEST_FIELDS}
+    weight = pd.Series(books['id'].map(loans).to_numpy() + 1, index=books.index)
+    for prefix in SUGGEST:
+        def scan_suggestions():
+            best = []
+            for field in SUGGEST_FIELDS:
+                found = texts[field][texts[field].str.contains(prefix, regex=False)]
+                found = found[[any(w.startswith(prefix) for w in word_starts(t)) for t in found]]
+                best += [(-w, t, field) for t, w in weight[found.index].groupby(found).sum().items()]
+            return [suggestions.base_display[f][t] for _, t, f in sorted(best)]
+
+        scan_ms, expected = per_call_ms(scan_suggestions)
+        index_ms, found = per_call_ms(lambda: suggestions.suggest(prefix, SUGGEST_FIELDS))
+        assert found == list(dict.fromkeys(expected))[:len(found)], prefix
+        print(f"{prefix:>26} {scan_ms:9.1f} {index_ms:9.3f}")
+
+    # Keeping the index in sync: what a commit does after add_book / update_book_details
+    start = time.perf_counter()
+    updated = index.copy()
+    updated.apply([Insert([{'id': 'GDL-NEW', 'title': 'Parthiban Kanavu', 'author': 'Kalki'}]),
+                   Update({'id': 'GDL-001'}, {'title': 'Sivagamiyin Sabatham'})], num_books + 1)
+    print(f"copy + apply(add, update): {(time.perf_counter() - start) * 1000:.1f} ms")
+    start = time.perf_counter()
+    updated = suggestions.copy()
+    updated.apply([Insert([{'id': 'GDL-NEW', 'title': 'Parthiban Kanavu', 'author': 'Kalki',
+                            'status': 'AVAILABLE'}]),
+                   Update({'id': 'GDL-001'}, {'status': 'LENT'})], num_books + 1)
+    print(f"suggestions copy + apply(add, lend): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+from storage import ExcelStorage, TABLES, TABLE_COLUMNS, EXCEL_FILES
+
+# Cold-start benchmark: time to read all four tables with a fresh storage
+# object, straight from the workbooks vs. from the Parquet shadows.
+#
+#   python bench_startup.py             uses a copy of data/
+#   python bench_startup.py 20000       synthetic catalog with 20000 books
+
+DATA_DIR = "data"
+RUNS = 5
+
+def make_synthetic(data_dir, num_books):
+    books = pd.DataFrame({
+        'id': [f"GDL-{i:03d}" for i in range(1, num_books + 1)],
+        'title': [f"புத்தகம் {i} Book Title {i}" for i in range(num_books)],
+        'author': [f"ஆசிரியர் {i % 500} Author {i % 500}" for i in range(num_books)],
+        'donated_by': ["" for _ in range(num_books)],
+        'status': ['AVAILABLE' if i % 7 else 'LENT' for i in range(num_books)],
+        'title_thanglish': [f"puththakam {i} book title {i}" for i in range(num_books)],
+        'author_thanglish': [f"aachiriyar {i % 500} author {i % 500}" for i in range(num_books)],
+    })
+    num_users = max(num_books // 10, 1)
+    users = pd.DataFrame({
+        'user_id': [f"MEM-{i:03d}" for i in range(1, num_users + 1)],
+        'name': [f"Member {i}" for i in range(num_users)],
+        'email': [f"member{i}@example.com" for i in range(num_users)],
+        'mobile': [str(9000000000 + i) for i in range(num_users)],
+        'role': 'USER',
+    })
+    num_tx = num_books // 2
+    transactions = pd.DataFrame({
+        'transaction_id': [f"TX-{i:08d}" for i in range(num_tx)],
+        'book_id': books['id'].iloc[:num_tx].values,
+        'book_title': books['title'].iloc[:num_tx].values,
+        'user_id': [users['user_id'].iloc[i % num_users] for i in range(num_tx)],
+        'user_name': [users['name'].iloc[i % num_users] for i in range(num_tx)],
+        'user_email': "",
+        'user_mobile': [users['mobile'].iloc[i % num_users] for i in range(num_tx)],
+        'borrow_date': "2026-01-01",
+        'return_date': "",
+        'status': ['ACTIVE' if i % 3 else 'RETURNED' for i in range(num_tx)],
+    })
+    pending = pd.DataFrame(columns=TABLE_COLUMNS['pending'])
+    for table, df in zip(TABLES, [books, users, transactions, pending]):
+        df.to_excel(os.path.join(data_dir, EXCEL_FILES[table]), index=False)
+
+def cold_start(data_dir, shadows):
+    start = time.perf_counter()
+    storage = ExcelStorage(data_dir, shadows=shadows)
+    rows = sum(len(storage.read(table)) for table in TABLES)
+    return time.perf_counter() - start, rows
+
+def best_of(data_dir, shadows):
+    return min(cold_start(data_dir, shadows)[0] for _ in range(RUNS))
+
+def main():
+    work_dir = tempfile.mkdtemp(prefix="library-bench-")
+    try:
+        if len(sys.argv) > 1:
+            make_synthetic(work_dir, int(sys.argv[1]))
+        else:
+            for name in EXCEL_FILES.values():
+                shutil.copy(os.path.join(DATA_DIR, name), work_dir)
+
+        excel = best_of(work_dir, shadows=False)
+        _, rows = cold_start(work_dir, shadows=True)  # builds the shadows
+        shadow = best_of(work_dir, shadows=True)
+
+        print(f"Rows loaded:          {rows}")
+        print(f"Excel (openpyxl):     {excel * 1000:8.1f} ms")
+        print(f"Parquet shadow:       {shadow * 1000:8.1f} ms")
+        print(f"Speed-up:             {excel / shadow:8.1f}x")
+    finally:
+        shutil.rmtree(work_dir)
+
+if __name__ == "__main__":
+    main()
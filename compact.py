@@ -0,0 +1,74 @@
+import pandas as pd
+from schema import SCHEMAS
+
+try:
+    import pyarrow  # noqa: F401  (needed for Arrow-backed strings)
+    try:
+        # NaN for missing values, like the regular string columns
+        _ARROW_STRING = pd.StringDtype('pyarrow', na_value=float('nan'))
+    except TypeError:  # pandas < 3
+        _ARROW_STRING = pd.StringDtype('pyarrow_numpy')
+except ImportError:
+    _ARROW_STRING = None
+
+# Compact in-memory representation of the cached tables (LIBRARY_COMPACT=1).
+#
+#   * status/role columns become categoricals over the schema enums
+#   * GDL-###/MEM-### ID columns are stored as their number (nullable Int32);
+#     expand() formats them back when a table is handed out
+#   * free-text columns (titles, authors, names) use Arrow-backed strings (the
+#     default string dtype on pandas 3 already is, so this matters on pandas 2)
+#
+# ID columns are only converted when every value round-trips exactly, so a
+# column containing e.g. 'WALK-IN' or 'GDL-0001' is left as text.
+
+
+def format_ids(numbers, prefix):
+    """Formats a Series of ID numbers as 'PREFIX-001' strings."""
+    text = prefix + '-' + numbers.astype(str).str.zfill(3)
+    return text.where(numbers.notna())
+
+def parse_ids(ids, prefix):
+    """Numbers behind 'PREFIX-001' strings, or None if any value wouldn't round-trip."""
+    present = ids.dropna()
+    digits = present.str.slice(len(prefix) + 1)
+    if not (present.str.startswith(prefix + '-') & digits.str.isdigit()).all():
+        return None
+    numbers = pd.to_numeric(digits).astype('Int32') if len(digits) else digits.astype('Int32')
+    if not (format_ids(numbers, prefix) == present).all():
+        return None
+    return numbers.reindex(ids.index)
+
+def compact(table, df):
+    """Returns the compact representation of a table."""
+    schema = SCHEMAS[table]
+    df = df.copy(deep=False)
+    for col, allowed in schema.enums.items():
+        observed = [v for v in df[col].dropna().unique() if v not in allowed]
+        df[col] = pd.Categorical(df[col], categories=list(allowed) + sorted(observed))
+    for col, prefix in schema.id_columns.items():
+        numbers = parse_ids(df[col], prefix)
+        if numbers is not None:
+            df[col] = numbers
+    if _ARROW_STRING is not None:
+        for col in schema.text:
+            df[col] = df[col].astype(_ARROW_STRING)
+    return df
+
+def expand(table, df):
+    """Formats integer-backed ID columns back to strings; other columns stay compact."""
+    schema = SCHEMAS[table]
+    df = df.copy(deep=False)
+    for col, prefix in schema.id_columns.items():
+        if pd.api.types.is_integer_dtype(df[col].dtype):
+            df[col] = format_ids(df[col], prefix)
+    return df
+
+def memory_report(tables):
+    """{table: (rows, bytes per row)} using deep memory usage."""
+    report = {}
+    for table, df in tables.items():
+        rows = len(df)
+        total = df.memory_usage(deep=True, index=False).sum()
+        report[table] = (rows, total / rows if rows else 0.0)
+    return report
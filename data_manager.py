@@ -1,7 +1,29 @@
+import numpy as np
 import pandas as pd
 from datetime import datetime
+import heapq
 import os
+import re
+import threading
+import time
+import unicodedata
+import functools
+from contextlib import contextmanager
 from transliterate_utils import transliterate_text
+import compact
+from schema import SCHEMAS, DELETED
+from storage import open_storage, Insert, Update, Delete
+from write_queue import WriteQueue, FileLock
+from table_index import TableIndex
+import search_index
+from search_index import NgramIndex, SearchCache
+from phonetic_index import PhoneticIndex, TOP_K
+import tamil_index
+from tamil_index import GraphemeIndex
+from suggest_index import SuggestIndex, SUGGESTIONS
+import member_index
+from member_index import MemberIndex
+from loan_index import LoanIndex
 
 # File paths
 DATA_DIR = "data"
@@ -10,52 +32,657 @@ USERS_FILE = os.path.join(DATA_DIR, "users.xlsx")
 TRANSACTIONS_FILE = os.path.join(DATA_DIR, "transactions.xlsx")
 PENDING_FILE = os.path.join(DATA_DIR, "pending_approvals.xlsx")
 
-def load_data():
-    """Loads all Excel files into pandas DataFrames."""
-    books = pd.read_excel(BOOKS_FILE)
-    users = pd.read_excel(USERS_FILE)
-    transactions = pd.read_excel(TRANSACTIONS_FILE)
-    
+DB_FILE = os.path.join(DATA_DIR, "library.db")
+WRITE_LOCK_FILE = os.path.join(DATA_DIR, ".write.lock")
+
+# Storage backend: 'excel' (one workbook per table, the default) or 'sqlite'
+# (data/library.db, see migrate_to_sqlite.py). Function signatures below are
+# the same for both.
+STORAGE_BACKEND = os.environ.get("LIBRARY_STORAGE", "excel")
+STORAGE = open_storage(STORAGE_BACKEND, DATA_DIR, DB_FILE)
+
+# --- Snapshot Cache ---
+# Parsed tables are shared by every Streamlit session in this process and are
+# only re-read when the storage signature changes: the workbook's (mtime, size)
+# for Excel, e.g. after an edit made directly in Excel, or the table version
+# for SQLite. Callers always get their own view of a snapshot.
+
+_snapshots = {}  # table name -> (storage signature, DataFrame)
+_snapshot_lock = threading.Lock()
+
+# With copy-on-write a shallow copy is a safe private view: mutating it
+# never touches the shared snapshot. pandas >= 3.0 always behaves this way.
+_COPY_ON_WRITE = int(pd.__version__.split('.')[0]) >= 3
+if not _COPY_ON_WRITE:
     try:
-        pending = pd.read_excel(PENDING_FILE)
-    except FileNotFoundError:
-        # Create empty pending file if it doesn't exist
-        pending = pd.DataFrame(columns=['transaction_id', 'book_id', 'book_title', 'user_id', 'user_name', 
-                                       'user_mobile', 'user_email', 'borrow_date', 'return_date', 'status'])
-        pending.to_excel(PENDING_FILE, index=False)
-    
-    # Ensure thanglish columns exist
-    if 'title_thanglish' not in books.columns:
-        books['title_thanglish'] = ""
-    if 'author_thanglish' not in books.columns:
-        books['author_thanglish'] = ""
-        
-    books['title_thanglish'] = books['title_thanglish'].fillna("").astype(str)
-    books['author_thanglish'] = books['author_thanglish'].fillna("").astype(str)
-    
-    return books, users, transactions, pending
+        pd.set_option('mode.copy_on_write', True)
+        _COPY_ON_WRITE = True
+    except (KeyError, pd.errors.OptionError):
+        pass
+
+def _view(df):
+    return df.copy(deep=not _COPY_ON_WRITE)
+
+# Opt-in compact snapshots (LIBRARY_COMPACT=1): categorical statuses,
+# integer-backed IDs and Arrow strings, see compact.py. IDs are formatted back
+# to 'GDL-001' strings whenever a table is handed out.
+COMPACT_TABLES = os.environ.get("LIBRARY_COMPACT") == "1"
+
+def _to_snapshot(name, df):
+    return compact.compact(name, df) if COMPACT_TABLES else df
+
+def _from_snapshot(name, df):
+    df = _view(df)
+    return compact.expand(name, df) if COMPACT_TABLES else df
+
+def _load_table(name):
+    """Returns a private view of one table, re-reading only if storage changed."""
+    uow = getattr(_local, 'uow', None)
+    if uow is not None and name in uow.tables:
+        # Read your own staged writes
+        return _view(uow.tables[name])
+
+    signature = STORAGE.signature(name)
+    with _snapshot_lock:
+        entry = _snapshots.get(name)
+    if entry is not None and signature is not None and entry[0] == signature:
+        return _from_snapshot(name, entry[1])
+
+    # Take the signature before reading: if storage changes mid-read the
+    # stale signature simply forces another read on the next call.
+    df = STORAGE.read(name)
+    if signature is None:
+        signature = STORAGE.signature(name)
+    snapshot = _to_snapshot(name, df)
+    with _snapshot_lock:
+        _snapshots[name] = (signature, snapshot)
+    return _from_snapshot(name, snapshot)
+
+def _save_table(name, df, changes=None):
+    """Persists one table and refreshes its snapshot without re-reading.
+
+    `changes` lists the storage.Insert/Update/Delete row changes that turned
+    the loaded table into `df`; backends that can apply them (SQLite, the
+    transactions journal) skip rewriting the whole table. Pass None when the
+    table was rebuilt. Inside a unit of work the save is only staged.
+    """
+    with unit_of_work() as uow:
+        uow.stage(name, df, changes)
+
+# --- Unit of Work ---
+# Operations that touch several tables (approve_lend, delete_book, ...) stage
+# their saves and commit them as one storage batch, so a crash can't leave
+# e.g. a book LENT without its transaction. Units nest: an inner
+# unit_of_work() joins the outer one, so helpers such as register_member
+# commit together with the operation that called them.
+
+_local = threading.local()
+
+class UnitOfWork:
+    def __init__(self):
+        self.tables = {}   # table name -> staged DataFrame
+        self.changes = {}  # table name -> row changes, or None for a full rewrite
+        self.versions = {}  # table name -> number of times staged
+        self.indexes = {}  # (table name, kind) -> (version, index, changes applied)
+
+    def stage(self, name, df, changes=None):
+        _check_values(name, df, changes)
+        self.tables[name] = _view(df)
+        self.versions[name] = self.versions.get(name, 0) + 1
+        if changes is None or (name in self.changes and self.changes[name] is None):
+            self.changes[name] = None
+        else:
+            self.changes[name] = self.changes.get(name, []) + list(changes)
+
+    def index(self, name, kind='hash'):
+        """Index of a staged table, caught up with its staged changes."""
+        version = self.versions[name]
+        cached = self.indexes.get((name, kind))
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        changes = self.changes[name]
+        index, applied = None, 0
+        if changes is not None:
+            if cached is not None:
+                index, applied = cached[1], cached[2]
+            else:
+                committed = _committed_index(name, kind)
+                index = committed.copy() if committed is not None else None
+            if index is not None and not index.apply(changes[applied:], len(self.tables[name])):
+                index = None
+        if index is None:
+            index = _build_index(name, self.tables[name], kind)
+        self.indexes[(name, kind)] = (version, index, len(changes) if changes is not None else 0)
+        return index
+
+    def savepoint(self):
+        return dict(self.tables), dict(self.changes), dict(self.versions)
+
+    def rollback(self, savepoint):
+        """Drops everything staged since `savepoint` was taken."""
+        tables, changes, versions = savepoint
+        self.tables, self.changes, self.versions = dict(tables), dict(changes), dict(versions)
+        self.indexes = {}  # may include rolled-back changes; caught up again on demand
+
+    def commit(self):
+        if not self.tables:
+            return
+        # Carry warm indexes over to the new snapshots (before the signatures change)
+        indexes = {(name, kind): self.index(name, kind)
+                   for name in self.tables for kind in _index_kinds(name)
+                   if (name, kind) in self.indexes or _committed_index(name, kind) is not None}
+        STORAGE.commit({name: (df, self.changes[name]) for name, df in self.tables.items()})
+        with _snapshot_lock:
+            for name, df in self.tables.items():
+                signature = STORAGE.signature(name)
+                _snapshots[name] = (signature, _to_snapshot(name, df))
+                for kind in INDEX_KINDS:
+                    if (name, kind) in indexes:
+                        _indexes[(name, kind)] = (signature, indexes[(name, kind)])
+                    else:
+                        _indexes.pop((name, kind), None)
+
+def _check_values(name, df, changes):
+    """Raises ValueError if a save would store a value outside a declared enum.
+
+    Only the rows `changes` insert or update are checked; all of `df` when
+    the table is rewritten.
+    """
+    if changes is None:
+        written = df
+    else:
+        written = pd.DataFrame([row for change in changes if isinstance(change, Insert)
+                                for row in change.rows]
+                               + [change.values for change in changes if isinstance(change, Update)])
+    problems = SCHEMAS[name].invalid_values(written)
+    if problems:
+        raise ValueError(f"Refusing to save {name}: values outside the schema {problems}")
+
+@contextmanager
+def unit_of_work():
+    """Stages every table save made inside the block and commits them together.
+
+    Nothing is written if the block raises.
+    """
+    outer = getattr(_local, 'uow', None)
+    if outer is not None:
+        yield outer
+        return
+
+    uow = UnitOfWork()
+    _local.uow = uow
+    try:
+        yield uow
+    finally:
+        _local.uow = None
+    uow.commit()
+
+# --- Writer Queue ---
+# All mutations run one at a time on a single writer thread, under a file lock
+# shared with other app processes. Mutations arriving within a short window
+# share one unit of work, so a burst of approvals writes each table once.
+
+WRITE_QUEUE = WriteQueue(unit_of_work, WRITE_LOCK_FILE)
+
+with FileLock(WRITE_LOCK_FILE):
+    # Finish (or discard) a batch interrupted by a crash before serving reads.
+    STORAGE.recover()
+
+def _serialized(func):
+    """Runs `func` on the writer queue (atomically, in a unit of work)."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return WRITE_QUEUE.submit(func, *args, **kwargs)
+    return wrapper
+
+def write_stats():
+    """Latency and batch-size statistics of the writer queue."""
+    return WRITE_QUEUE.stats()
+
+def memory_report():
+    """{table: (rows, bytes per row)} of the cached snapshots."""
+    with _snapshot_lock:
+        tables = {name: df for name, (_, df) in _snapshots.items()}
+    return compact.memory_report(tables)
+
+def invalidate_cache(name=None):
+    """Drops one (or every) cached snapshot so the next read re-parses it."""
+    with _snapshot_lock:
+        if name is None:
+            _snapshots.clear()
+            _indexes.clear()
+        else:
+            _snapshots.pop(name, None)
+            for kind in INDEX_KINDS:
+                _indexes.pop((name, kind), None)
+
+# --- Table Accessors ---
+# Each returns a private view of one table, loaded (and cached) on demand.
+# Prefer these over load_data() when only some tables are needed. Deleted
+# books and members are left out; mutations that save the whole table load it
+# with _load_table() so the tombstones are kept.
+
+def get_books():
+    return SCHEMAS['books'].live(_load_table('books'))
+
+def get_users():
+    return SCHEMAS['users'].live(_load_table('users'))
+
+def get_transactions():
+    return _load_table('transactions')
+
+def get_pending():
+    return _load_table('pending')
+
+def get_transactions_by_status(status):
+    """Transactions with `status`, in table order."""
+    transactions = get_transactions()
+    return transactions[transactions['status'] == status]
+
+def load_data():
+    """Loads all four tables (served from the snapshot cache)."""
+    return get_books(), get_users(), get_transactions(), get_pending()
 
 # --- Helper Functions ---
 
+# Transaction IDs are TX-<YYYYmmddHHMMSSfff>-<node>-<seq>: local creation time
+# to the millisecond, the process that made it (LIBRARY_NODE_ID, default the
+# PID) and a counter within that millisecond. IDs from one process strictly
+# increase even if the clock steps back, and no two running processes share a
+# node, so bursts can't collide. Legacy TX-YYYYmmddHHMMSS IDs sort first.
+_tx_lock = threading.Lock()
+_tx_last = [0, -1]  # [millisecond, counter]
+
 def get_next_tx_id():
-    return f"TX-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    now_ms = time.time_ns() // 1_000_000
+    with _tx_lock:
+        last_ms, seq = _tx_last
+        if now_ms > last_ms:
+            last_ms, seq = now_ms, 0
+        elif seq < 999:
+            seq += 1
+        else:
+            # 1000 IDs in one millisecond: borrow the next one
+            last_ms, seq = last_ms + 1, 0
+        _tx_last[:] = [last_ms, seq]
+    node = os.environ.get("LIBRARY_NODE_ID") or f"{os.getpid():06X}"
+    stamp = datetime.fromtimestamp(last_ms // 1000).strftime('%Y%m%d%H%M%S')
+    return f"TX-{stamp}{last_ms % 1000:03d}-{node}-{seq:03d}"
 
 def normalize_mobile(val):
-    """Clean mobile number robustly."""
-    try:
-        f_val = float(val)
-        i_val = int(f_val)
-        return str(i_val)
-    except (ValueError, TypeError):
-        s = str(val).strip()
-        if s.endswith('.0'):
-            return s[:-2]
-        return s
+    """Clean mobile number robustly (schema.normalize_mobiles for a whole column)."""
+    if not isinstance(val, str):
+        if val is None or pd.isna(val):
+            return ""
+        if isinstance(val, float) and val.is_integer():
+            # Legacy numeric cell
+            return str(int(val))
+    s = str(val).strip()
+    if s.endswith('.0'):
+        return s[:-2]
+    return s
+
+# --- Hash Indexes ---
+# Point lookups (a book by id, a member by id or mobile, a member's records)
+# use TableIndex dictionaries kept next to the snapshots instead of scanning
+# a column. A commit applies its row changes to a copy of the index, and a
+# unit of work catches the index of a staged table up with its own changes,
+# so nothing is rebuilt except after a full-table rewrite, a removed pending
+# request (pending only holds open requests, so that stays small) or a cold
+# read.
+
+# Mobiles are indexed through the stored mobile_norm / user_mobile_norm
+# columns; look them up with normalize_mobile(mobile).
+
+# Circulation records are found by member ID, mobile or name (get_user_history)
+_CIRCULATION_COLUMNS = {
+    'transaction_id': None,
+    'user_id': lambda v: str(v).strip().upper(),
+    'user_mobile_norm': None,
+    'user_name': lambda v: str(v).strip().lower(),
+}
+
+# Loans are also indexed by (book_id, status) for the "is this book out?"
+# checks, as the transaction history only grows
+INDEXED_COLUMNS = {
+    'books': {'id': None},
+    'users': {'user_id': lambda v: str(v).upper(), 'mobile_norm': None},
+    'transactions': {**_CIRCULATION_COLUMNS, ('book_id', 'status'): None},
+    'pending': _CIRCULATION_COLUMNS,
+}
+
+# Substring search over a table's text fields uses an NgramIndex
+# (search_index.py), kept the same way but only built on the first search
+SEARCH_FIELDS = {
+    'books': ('title', 'author', 'id', 'title_thanglish', 'author_thanglish'),
+}
+
+# Fuzzy Tanglish search uses a PhoneticIndex (phonetic_index.py), also built
+# on first use
+PHONETIC_FIELDS = {
+    'books': ('title_thanglish', 'author_thanglish'),
+}
+
+# Queries in Tamil script match whole grapheme clusters (the last one as it
+# is being typed) through a GraphemeIndex (tamil_index.py), also built on
+# first use
+TAMIL_FIELDS = {
+    'books': ('title', 'author'),
+}
+
+# Autocomplete ranks the texts of these fields by copies and loans through a
+# SuggestIndex (suggest_index.py), also built on first use
+SUGGEST_FIELDS = {
+    'books': ('title', 'author', 'title_thanglish', 'author_thanglish'),
+}
+
+def _build_suggestions(df, key, fields):
+    loans = get_transactions()['book_id'].value_counts().to_dict()
+    return SuggestIndex.build(df, key, fields, loans)
+
+# Member search matches names and emails by trigram, IDs by prefix and
+# mobiles by leading or trailing digits through a MemberIndex
+# (member_index.py): (text fields, mobile field), also built on first use
+MEMBER_FIELDS = {
+    'users': (('name', 'email'), 'mobile_norm'),
+}
+
+# The admin dashboard searches and sorts the loans out through a LoanIndex
+# (loan_index.py) holding only the ACTIVE transactions: (search fields, other
+# columns to sort by or match updates on), also built on first use
+LOAN_FIELDS = {
+    'transactions': (('book_title', 'book_id', 'user_name', 'user_mobile'),
+                     ('user_id', 'borrow_date')),
+}
+LOAN_BOOK_SEARCH = ('book_title', 'book_id')
+LOAN_USER_SEARCH = ('user_name', 'user_mobile')
+
+# Index kind -> (table name -> columns, builder)
+INDEX_KINDS = {
+    'hash': (INDEXED_COLUMNS, TableIndex.build),
+    'search': (SEARCH_FIELDS, NgramIndex.build),
+    'phonetic': (PHONETIC_FIELDS, PhoneticIndex.build),
+    'tamil': (TAMIL_FIELDS, GraphemeIndex.build),
+    'suggest': (SUGGEST_FIELDS, _build_suggestions),
+    'member': (MEMBER_FIELDS, MemberIndex.build),
+    'loans': (LOAN_FIELDS, LoanIndex.build),
+}
+
+_indexes = {}  # (table name, kind) -> (storage signature, index)
+
+def _index_kinds(name):
+    return [kind for kind, (specs, _) in INDEX_KINDS.items() if name in specs]
+
+def _build_index(name, df, kind='hash'):
+    specs, build = INDEX_KINDS[kind]
+    return build(df, SCHEMAS[name].key, specs[name])
+
+def _committed_index(name, kind='hash'):
+    """The shared index of `name` if it matches storage, else None."""
+    signature = STORAGE.signature(name)
+    with _snapshot_lock:
+        entry = _indexes.get((name, kind))
+    if entry is not None and signature is not None and entry[0] == signature:
+        return entry[1]
+    return None
+
+def _table_index(name, kind='hash'):
+    """Index of the table as _load_table(name) currently returns it."""
+    uow = getattr(_local, 'uow', None)
+    if uow is not None and name in uow.tables:
+        return uow.index(name, kind)
+    index = _committed_index(name, kind)
+    if index is None:
+        signature = STORAGE.signature(name)
+        index = _build_index(name, _load_table(name), kind)
+        with _snapshot_lock:
+            _indexes[(name, kind)] = (signature, index)
+    return index
+
+def _find(name, df, column, value, exact=False):
+    """Positions of the rows of `df` (as loaded by _load_table) matching `value`.
+
+    Matches use the column's normalisation (upper-cased member IDs, normalised
+    mobiles) unless `exact` is set. Candidates are re-checked against `df`, so
+    a concurrent commit can't hand back a wrong row. A composite `column`
+    (a tuple of columns) takes a tuple `value` and always matches exactly.
+    """
+    index = _table_index(name)
+    candidates = index.get(column, value)
+    if isinstance(column, tuple) or exact:
+        columns, values = (column, value) if isinstance(column, tuple) else ((column,), (value,))
+        cells = [df[c] for c in columns]
+        return [pos for pos in candidates
+                if pos < len(df) and all(s.iat[pos] == v for s, v in zip(cells, values))]
+    key = index.normalized(column, value)
+    cells = df[column]
+    return [pos for pos in candidates
+            if pos < len(df) and index.normalized(column, cells.iat[pos]) == key]
+
+def _rows(name, df, column, value):
+    """Index labels of the rows of `df` whose `column` equals `value`."""
+    return df.index[_find(name, df, column, value, exact=True)]
+
+def _first_live(name, df, column, value, exact=False):
+    """Position of the first matching row that isn't a tombstone, or None."""
+    tombstone = df[SCHEMAS[name].tombstone]
+    for pos in _find(name, df, column, value, exact):
+        if tombstone.iat[pos] != DELETED:
+            return pos
+    return None
+
+def _matched_rows(name, signature, df, positions, keep):
+    """The rows of `df` (as loaded by _load_table) at the index `positions`.
+
+    `signature` is the storage signature taken before `df` and the index were
+    read. If a commit landed since, the two may disagree, so only the rows
+    for which keep(pos, row) holds (`row` a dict of the row) are returned.
+    """
+    rows = len(df)
+    positions = [pos for pos in positions if pos < rows]
+    df = df.iloc[positions]
+    if signature is None or STORAGE.signature(name) != signature:
+        found = [keep(pos, row) for pos, row in zip(positions, df.to_dict('records'))]
+        df = df[np.array(found, dtype=bool)]
+    return df
+
+def _search(name, query, fields, cache=None, kind='search'):
+    """Rows of _load_table(name) where any of `fields` contains `query`.
+
+    Matching is case-insensitive and literal, on the texts as the `kind` of
+    index normalises them. A SearchCache `cache` serves repeated and
+    narrowing queries for the same version of the table. If a commit lands
+    while the table and its search index are read, the matches are
+    re-checked.
+    """
+    signature = STORAGE.signature(name)
+    df = _load_table(name)
+    index = _table_index(name, kind)
+    uow = getattr(_local, 'uow', None)
+    if cache is None or signature is None or (uow is not None and name in uow.tables):
+        positions = index.search(query, fields)
+    else:
+        positions = cache.search(index, signature, query, fields)
+    return _matched_rows(name, signature, df, positions,
+                         lambda pos, row: any(index.contains(row[f], query) for f in fields))
+
+# --- ID Sequences ---
+# New GDL-/MEM- IDs come from a persistent per-prefix counter kept by the
+# storage backend instead of a scan for the current maximum. Reserved numbers
+# are not returned if the operation later fails, so IDs may skip a number.
+
+def _format_id(prefix, number):
+    return f"{prefix}-{str(number).zfill(3)}"
+
+def _id_numbers(ids, prefix):
+    """Numbers of 'PREFIX-123' IDs as floats (NaN where there is none)."""
+    return pd.to_numeric(ids.astype(str).str.extract(rf'{prefix}-(\d+)', expand=False))
+
+def _max_id_number(ids, prefix):
+    """Highest number among 'PREFIX-123' IDs (0 if none); a full scan."""
+    numbers = _id_numbers(ids, prefix)
+    return 0 if numbers.isna().all() else int(numbers.max())
+
+def _reserve_ids(table, df, count=1):
+    """Reserves `count` consecutive new IDs for `table` (`df` as loaded).
+
+    The key column is only scanned to seed a new sequence, or to resync it
+    when a reserved ID is already taken (rows added to the workbook by hand).
+    """
+    schema = SCHEMAS[table]
+    prefix = schema.id_prefix
+    last = STORAGE.read_sequence(prefix)
+    if last is None:
+        last = _max_id_number(df[schema.key], prefix)
+    new_ids = [_format_id(prefix, n) for n in range(last + 1, last + count + 1)]
+    if any(_find(table, df, schema.key, new_id, exact=True) for new_id in new_ids):
+        last = _max_id_number(df[schema.key], prefix)
+        new_ids = [_format_id(prefix, n) for n in range(last + 1, last + count + 1)]
+    STORAGE.write_sequence(prefix, last + count)
+    return new_ids
+
+def _reset_sequence(table, last):
+    """Restarts a sequence after renumber_ids(), so the next ID is `last` + 1."""
+    STORAGE.write_sequence(SCHEMAS[table].id_prefix, last)
 
 # --- Book Management ---
 
+def search_books_fuzzy(query, fields=PHONETIC_FIELDS['books'], k=TOP_K):
+    """Up to `k` books whose Tanglish `fields` sound like `query`, best match first.
+
+    Spelling variants ("ponniyan selvam" for "Ponniyin Selvan") match through
+    the phonetic index. An empty query matches nothing.
+    """
+    signature = STORAGE.signature('books')
+    books = _load_table('books')
+    index = _table_index('books', 'phonetic')
+    status, rows = books['status'], len(books)
+    positions = index.ranked(query, fields, k,
+                             keep=lambda pos: pos < rows and status.iat[pos] != DELETED)
+    # Keep the rows whose phonetic keys still agree with the index
+    return _matched_rows('books', signature, books, positions,
+                         lambda pos, row: all(PhoneticIndex.normalize(row[f]) == index.text(f, pos)
+                                              for f in fields))
+
+def search_books(query, fields=SEARCH_FIELDS['books'], cache=None):
+    """Books whose `fields` contain `query` (case-insensitive), in table order.
+
+    Served from the catalog's n-gram index, or from `cache` (a SearchCache
+    kept per session) while the user types. A query in Tamil script is
+    matched by grapheme against the Tamil `fields` (title, author) only. An
+    empty query returns every book.
+    """
+    if not query:
+        return get_books()
+    if tamil_index.is_tamil(query):
+        fields = [f for f in fields if f in TAMIL_FIELDS['books']]
+        if not fields:
+            return get_books().iloc[:0]
+        return SCHEMAS['books'].live(_search('books', query, fields, cache, kind='tamil'))
+    return SCHEMAS['books'].live(_search('books', query, fields, cache))
+
+def suggest_books(prefix, fields=SUGGEST_FIELDS['books'], n=SUGGESTIONS):
+    """Up to `n` titles or authors from `fields` with a word starting with `prefix`.
+
+    Most popular first: texts shared by more live copies, and by copies lent
+    more often, rank higher.
+    """
+    if not prefix:
+        return []
+    return _table_index('books', 'suggest').suggest(prefix, fields, n)
+
+# Browse ranking: points for each way a book matches the search. An exact ID
+# beats everything; an available copy beats a lent one that matches as well.
+RANK_WEIGHTS = {'id': 1000, 'prefix': 40, 'word': 20, 'tanglish': 10, 'available': 15}
+TITLE_SEARCH = ('title', 'title_thanglish', 'id')
+AUTHOR_SEARCH = ('author', 'author_thanglish')
+RESULTS_PER_PAGE = 50
+
+def _match_points(texts, query):
+    """RANK_WEIGHTS points of each of `texts` for starting with `query` and holding it as a word."""
+    query = " ".join(unicodedata.normalize('NFC', query).lower().split())
+    texts = texts.fillna('').astype(str)
+    if not query.isascii():
+        texts = texts.str.normalize('NFC')  # Tamil vowel signs have two encodings
+    texts = texts.str.lower()
+    prefix = texts.str.startswith(query).to_numpy(dtype=bool)
+    word = texts.str.contains(rf'(?:^|\s){re.escape(query)}(?:\s|$)').to_numpy(dtype=bool)
+    return prefix * RANK_WEIGHTS['prefix'] + word * RANK_WEIGHTS['word']
+
+def _top_k(scores, titles, rows, k):
+    """Positions of the `k` best rows: highest score, then title, then table row."""
+    if len(scores) > k:
+        # Only rows tied with the k-th best score need their titles compared
+        cut = -np.partition(-scores, k - 1)[k - 1]
+        candidates = np.flatnonzero(scores > cut).tolist()
+        tied = np.flatnonzero(scores == cut)
+        best = heapq.nsmallest(k - len(candidates),
+                               zip(titles.iloc[tied].tolist(), rows[tied].tolist(), tied.tolist()))
+        candidates += [p for _, _, p in best]
+    else:
+        candidates = range(len(scores))
+    titles = {p: titles.iat[p] for p in candidates}
+    return sorted(candidates, key=lambda p: (-scores[p], titles[p], rows[p]))
+
+def _after(scores, titles, rows, cursor):
+    """Which rows rank after the row with key `cursor` (score, title, table row)."""
+    score, title, row = cursor
+    keep = scores < score
+    tied = np.flatnonzero(scores == score)
+    tied_titles = titles.iloc[tied]
+    later = (tied_titles > title) | ((tied_titles == title) & (rows[tied] > row))
+    keep[tied[later.to_numpy(dtype=bool)]] = True
+    return keep
+
+def rank_books(title_query="", author_query="", available_only=False, k=RESULTS_PER_PAGE,
+               cache=None, after=None):
+    """A page of the best matching books: (books, total matches, cursor of the next page).
+
+    Books match when their title, Tanglish title or ID contain `title_query`
+    and their author or Tanglish author contain `author_query` (see
+    search_books; `cache` is passed on). They are ranked by RANK_WEIGHTS
+    points: an exact ID, a title or author starting with the query or
+    holding it as a whole word, the same in the Tanglish forms, and being
+    available. Ties go by title. Only the `k` books of the page are sorted.
+
+    The page starts after the book that ended the page the `after` cursor
+    came from, so books added or changed meanwhile don't shift later pages.
+    The returned cursor is None on the last page.
+    """
+    books = search_books(title_query, TITLE_SEARCH, cache) if title_query else get_books()
+    if author_query:
+        by_author = search_books(author_query, AUTHOR_SEARCH, cache)
+        books = books[books.index.isin(by_author.index)]
+    if available_only:
+        books = books[books['status'] == 'AVAILABLE']
+
+    scores = (books['status'] == 'AVAILABLE').to_numpy(dtype=np.int64) * RANK_WEIGHTS['available']
+    for query, field, tanglish in ((title_query, 'title', 'title_thanglish'),
+                                   (author_query, 'author', 'author_thanglish')):
+        if query:
+            scores += _match_points(books[field], query)
+            scores += (_match_points(books[tanglish], query) > 0) * RANK_WEIGHTS['tanglish']
+    if title_query:
+        exact = books['id'].astype(str).str.upper() == title_query.strip().upper()
+        scores += exact.to_numpy(dtype=bool) * RANK_WEIGHTS['id']
+    titles = books['title'].fillna('').astype(str)
+    rows = books.index.to_numpy()  # table row numbers: stable across snapshots
+    total = len(books)
+    if after is not None:
+        keep = _after(scores, titles, rows, after)
+        books, scores, titles, rows = books[keep], scores[keep], titles[keep], rows[keep]
+
+    top = _top_k(scores, titles, rows, k)
+    cursor = None
+    if top and len(books) > len(top):
+        last = top[-1]
+        cursor = (int(scores[last]), titles.iat[last], int(rows[last]))
+    return books.iloc[top], total, cursor
+
+@_serialized
 def add_book(title, author, donated_by, title_thanglish, author_thanglish):
-    books, _, _, _ = load_data()
+    books = _load_table('books')
     
     # Auto-Transliterate if missing
     if not title_thanglish:
@@ -65,45 +692,9 @@ def add_book(title, author, donated_by, title_thanglish, author_thanglish):
         author_thanglish = transliterate_text(author)
     
     # Determine new ID
-    import re
-    max_num = 0
-    for book_id in books['id']:
-        match = re.search(r'GDL-(\d+)', str(book_id))
-        if match:
-            num = int(match.group(1))
-            if num > max_num:
-                max_num = num
-    
-    new_id = f"GDL-{str(max_num + 1).zfill(3)}"
-    
-    new_book = pd.DataFrame([{
-        'id': new_id,
-        'title': title,
-        'author': author,
-        'donated_by': donated_by,
-        'title_thanglish': title_thanglish,
-        'author_thanglish': author_thanglish,
-        'status': 'AVAILABLE'
-    }])
-    
-    books = pd.concat([books, new_book], ignore_index=True)
-    books.to_excel(BOOKS_FILE, index=False)
-    return True, new_id
-    books, _, _, _ = load_data()
+    new_id = _reserve_ids('books', books)[0]
     
-    # Determine new ID
-    import re
-    max_num = 0
-    for book_id in books['id']:
-        match = re.search(r'GDL-(\d+)', str(book_id))
-        if match:
-            num = int(match.group(1))
-            if num > max_num:
-                max_num = num
-    
-    new_id = f"GDL-{str(max_num + 1).zfill(3)}"
-    
-    new_book = pd.DataFrame([{
+    new_book = SCHEMAS['books'].frame([{
         'id': new_id,
         'title': title,
         'author': author,
@@ -114,9 +705,10 @@ def add_book(title, author, donated_by, title_thanglish, author_thanglish):
     }])
     
     books = pd.concat([books, new_book], ignore_index=True)
-    books.to_excel(BOOKS_FILE, index=False)
+    _save_table('books', books, [Insert(new_book.to_dict('records'))])
     return True, new_id
 
+@_serialized
 def add_book_copies(original_book_id, num_copies):
     try:
         num_copies = int(num_copies)
@@ -125,118 +717,120 @@ def add_book_copies(original_book_id, num_copies):
     except:
         return False, "Invalid number"
     
-    books, _, _, _ = load_data()
+    books = _load_table('books')
     
     # Get original book
-    original = books[books['id'] == original_book_id]
-    if original.empty:
+    pos = _first_live('books', books, 'id', original_book_id)
+    if pos is None:
         return False, "Original Book ID not found."
+    original = books.iloc[[pos]]
     
     # ID generation
-    import re
-    max_num = 0
-    for book_id in books['id']:
-        match = re.search(r'GDL-(\d+)', str(book_id))
-        if match:
-            num = int(match.group(1))
-            if num > max_num:
-                max_num = num
-    
+    generated_ids = _reserve_ids('books', books, num_copies)
     new_books = []
-    generated_ids = []
     
-    for i in range(num_copies):
-        new_id = f"GDL-{str(max_num + 1 + i).zfill(3)}"
+    for new_id in generated_ids:
         new_copy = original.iloc[0].copy()
         new_copy['id'] = new_id
         new_copy['status'] = 'AVAILABLE'
         new_books.append(new_copy)
-        generated_ids.append(new_id)
     
-    books = pd.concat([books, pd.DataFrame(new_books)], ignore_index=True)
-    books.to_excel(BOOKS_FILE, index=False)
+    new_books = SCHEMAS['books'].frame(new_books)
+    books = pd.concat([books, new_books], ignore_index=True)
+    _save_table('books', books, [Insert(new_books.to_dict('records'))])
     
     return True, f"Added {num_copies} copies! IDs: {generated_ids[0]} to {generated_ids[-1]}"
 
+@_serialized
 def update_book_details(book_id, title, author, donated_by, title_thanglish, author_thanglish):
-    books, _, _, _ = load_data()
-    
-    if book_id in books['id'].values:
-        books.loc[books['id'] == book_id, 'title'] = title
-        books.loc[books['id'] == book_id, 'author'] = author
-        books.loc[books['id'] == book_id, 'donated_by'] = donated_by
-        books.loc[books['id'] == book_id, 'title_thanglish'] = title_thanglish
-        books.loc[books['id'] == book_id, 'author_thanglish'] = author_thanglish
-        books.to_excel(BOOKS_FILE, index=False)
+    books = _load_table('books')
+    
+    if _first_live('books', books, 'id', book_id) is not None:
+        rows = _rows('books', books, 'id', book_id)
+        books.loc[rows, 'title'] = title
+        books.loc[rows, 'author'] = author
+        books.loc[rows, 'donated_by'] = donated_by
+        books.loc[rows, 'title_thanglish'] = title_thanglish
+        books.loc[rows, 'author_thanglish'] = author_thanglish
+        _save_table('books', books, [Update({'id': book_id}, {
+            'title': title, 'author': author, 'donated_by': donated_by,
+            'title_thanglish': title_thanglish, 'author_thanglish': author_thanglish})])
         return True, "Book details updated."
     return False, "Book ID not found."
 
+@_serialized
 def delete_book(book_id):
-    books, _, transactions, pending = load_data()
+    books = _load_table('books')
+    transactions = get_transactions()
     
-    book = books[books['id'] == book_id]
-    if book.empty:
+    book = books.loc[_rows('books', books, 'id', book_id)]
+    if book.empty or book.iloc[0]['status'] == DELETED:
         return False, "Book not found."
         
     if book.iloc[0]['status'] == 'LENT':
         return False, "Cannot delete book. It is currently LENT out."
         
+    if book.iloc[0]['status'] == 'PENDING':
+        return False, "Cannot delete book. It has a pending lend request."
+        
     # Check if there are any active transactions referencing this book (double check)
-    active_tx = transactions[(transactions['book_id'] == book_id) & (transactions['status'] == 'ACTIVE')]
-    if not active_tx.empty:
+    if _find('transactions', transactions, ('book_id', 'status'), (book_id, 'ACTIVE')):
         return False, "Cannot delete book. Active transactions exist."
 
-    # Proceed to delete
-    books = books[books['id'] != book_id]
-    
-    # Auto-Renumber
-    books, transactions, pending = _renumber_books_internal(books, transactions, pending)
+    # Leave a tombstone: the ID stays taken and history still points at it.
+    # renumber_ids() removes tombstones and closes the gaps offline.
+    books.loc[book.index, 'status'] = DELETED
+    _save_table('books', books, [Update({'id': book_id}, {'status': DELETED})])
     
-    books.to_excel(BOOKS_FILE, index=False)
-    transactions.to_excel(TRANSACTIONS_FILE, index=False)
-    pending.to_excel(PENDING_FILE, index=False)
-    
-    return True, f"Book deleted. IDs updated."
+    return True, "Book deleted."
 
 # --- Member Management ---
 
 def get_member_by_id(user_id):
-    _, users, _, _ = load_data()
+    users = _load_table('users')
     # Case insensitive search
-    user = users[users['user_id'].astype(str).str.upper() == str(user_id).upper()]
-    if not user.empty:
-        return user.iloc[0].to_dict()
+    pos = _first_live('users', users, 'user_id', user_id)
+    if pos is not None:
+        return users.iloc[pos].to_dict()
     return None
 
 def get_member_by_mobile(mobile):
-    _, users, _, _ = load_data()
-    norm_mobile = normalize_mobile(mobile)
-    # Check mobile
-    user = users[users['mobile'].apply(normalize_mobile) == norm_mobile]
-    if not user.empty:
-        return user.iloc[0].to_dict()
+    users = _load_table('users')
+    # Mobiles are compared normalised
+    pos = _first_live('users', users, 'mobile_norm', normalize_mobile(mobile))
+    if pos is not None:
+        return users.iloc[pos].to_dict()
     return None
 
+def search_members(query):
+    """Members matching `query`, in table order (every member if it is empty).
+
+    A member matches when the name or email contains `query`, the member ID
+    starts with it, or, for a phone-like query, the mobile starts or ends
+    with its digits. Served from the member index.
+    """
+    if not query:
+        return get_users()
+    signature = STORAGE.signature('users')
+    users = _load_table('users')
+    positions = _table_index('users', 'member').search(query)
+    text_fields, mobile = MEMBER_FIELDS['users']
+    users = _matched_rows('users', signature, users, positions, lambda pos, row: member_index.matches(
+        query, [row[f] for f in text_fields], row['user_id'], row[mobile]))
+    return SCHEMAS['users'].live(users)
+
+@_serialized
 def register_member(name, mobile, email):
-    _, users, _, _ = load_data()
+    users = _load_table('users')
     
     # Check mobile uniqueness
-    if mobile in users['mobile'].astype(str).values:
+    if _first_live('users', users, 'mobile_norm', normalize_mobile(mobile)) is not None:
         return False, "Member with this mobile number already exists."
     
     # ID generation
-    import re
-    max_num = 0
-    for user_id in users['user_id']:
-        match = re.search(r'MEM-(\d+)', str(user_id))
-        if match:
-            num = int(match.group(1))
-            if num > max_num:
-                max_num = num
-    
-    new_id = f"MEM-{str(max_num + 1).zfill(3)}"
-    
-    new_user = pd.DataFrame([{
+    new_id = _reserve_ids('users', users)[0]
+    
+    new_user = SCHEMAS['users'].frame([{
         'user_id': new_id,
         'name': name,
         'email': email,
@@ -245,39 +839,56 @@ def register_member(name, mobile, email):
     }])
     
     users = pd.concat([users, new_user], ignore_index=True)
-    users.to_excel(USERS_FILE, index=False)
+    _save_table('users', users, [Insert(new_user.to_dict('records'))])
     return True, f"Member Registered Successfully! ID: {new_id}"
 
+@_serialized
 def update_user_details(user_id, name, mobile, email):
-    _, users, transactions, pending = load_data()
+    users = _load_table('users')
+    transactions = get_transactions()
+    pending = get_pending()
     
-    if user_id in users['user_id'].values:
+    if _first_live('users', users, 'user_id', user_id, exact=True) is not None:
         # 1. Update User Registry
-        users.loc[users['user_id'] == user_id, 'name'] = name
-        users.loc[users['user_id'] == user_id, 'mobile'] = mobile
-        users.loc[users['user_id'] == user_id, 'email'] = email
-        users.to_excel(USERS_FILE, index=False)
+        rows = _rows('users', users, 'user_id', user_id)
+        mobile_norm = normalize_mobile(mobile)
+        users.loc[rows, 'name'] = name
+        users.loc[rows, 'mobile'] = mobile
+        users.loc[rows, 'mobile_norm'] = mobile_norm
+        users.loc[rows, 'email'] = email
+        _save_table('users', users, [Update({'user_id': user_id}, {
+            'name': name, 'mobile': mobile, 'mobile_norm': mobile_norm, 'email': email})])
         
         # 2. Propagate to Transactions (Active/Returned/etc)
         # Check if user_id exists in transactions
+        mobile_values = {'user_mobile': str(mobile), 'user_mobile_norm': mobile_norm}
         if 'user_id' in transactions.columns and user_id in transactions['user_id'].values:
-            transactions.loc[transactions['user_id'] == user_id, 'user_mobile'] = str(mobile)
-            transactions.to_excel(TRANSACTIONS_FILE, index=False)
+            for col, val in mobile_values.items():
+                transactions.loc[transactions['user_id'] == user_id, col] = val
+            _save_table('transactions', transactions,
+                        [Update({'user_id': user_id}, mobile_values)])
             
         # 3. Propagate to Pending Requests
         if 'user_id' in pending.columns and user_id in pending['user_id'].values:
-            pending.loc[pending['user_id'] == user_id, 'user_mobile'] = str(mobile)
-            pending.to_excel(PENDING_FILE, index=False)
+            for col, val in mobile_values.items():
+                pending.loc[pending['user_id'] == user_id, col] = val
+            _save_table('pending', pending,
+                        [Update({'user_id': user_id}, mobile_values)])
             
         return True, "User details updated across registry and all records."
     return False, "User ID not found."
 
+@_serialized
 def delete_member(user_id):
-    _, users, transactions, pending = load_data()
+    users = _load_table('users')
+    transactions = get_transactions()
+    pending = get_pending()
     
     # Check for active loans
-    active_loans = transactions[(transactions['user_id'] == user_id) & (transactions['status'] == 'ACTIVE')]
-    if not active_loans.empty:
+    statuses = transactions['status']
+    active_loans = [pos for pos in _find('transactions', transactions, 'user_id', user_id, exact=True)
+                    if statuses.iat[pos] == 'ACTIVE']
+    if active_loans:
         return False, f"Cannot delete member. They have {len(active_loans)} active loans returned."
         
     # Check for pending requests
@@ -285,17 +896,12 @@ def delete_member(user_id):
     if not pending_reqs.empty:
         return False, "Cannot delete member. They have pending book requests."
         
-    if user_id in users['user_id'].values:
-        users = users[users['user_id'] != user_id]
-        
-        # Auto-Renumber
-        users, transactions, pending = _renumber_members_internal(users, transactions, pending)
+    if _first_live('users', users, 'user_id', user_id, exact=True) is not None:
+        # Tombstone, see delete_book
+        users.loc[_rows('users', users, 'user_id', user_id), 'role'] = DELETED
+        _save_table('users', users, [Update({'user_id': user_id}, {'role': DELETED})])
         
-        users.to_excel(USERS_FILE, index=False)
-        transactions.to_excel(TRANSACTIONS_FILE, index=False)
-        pending.to_excel(PENDING_FILE, index=False)
-        
-        return True, f"Member deleted. IDs updated."
+        return True, "Member deleted."
         
     return False, "User ID not found."
 
@@ -303,12 +909,13 @@ def delete_member(user_id):
 
 # --- Transaction Flows ---
 
+@_serialized
 def lend_book_request(book_id, user_name, mobile, email, member_id=None):
-    books, users, _, pending = load_data()
+    books = _load_table('books')
     
     # Check book exists and is available
-    book = books[books['id'] == book_id]
-    if book.empty:
+    book = books.loc[_rows('books', books, 'id', book_id)]
+    if book.empty or book.iloc[0]['status'] == DELETED:
         return False, "Book not found."
     
     if book.iloc[0]['status'] != 'AVAILABLE':
@@ -324,7 +931,7 @@ def lend_book_request(book_id, user_name, mobile, email, member_id=None):
         if mem:
             final_user_id = mem['user_id']
             # Update connection if details differ
-            stored_mobile = normalize_mobile(mem['mobile'])
+            stored_mobile = mem['mobile_norm']
             input_mobile = normalize_mobile(mobile)
             stored_email = str(mem['email']).strip() if pd.notna(mem['email']) else ""
             input_email = str(email).strip()
@@ -357,13 +964,16 @@ def lend_book_request(book_id, user_name, mobile, email, member_id=None):
                  # User asked for "auto add member", so we should probably succeed.
                  pass
 
+    # Load pending only now: update_user_details above may have staged changes to it
+    pending = get_pending()
+
     # Update book status
-    books.loc[books['id'] == book_id, 'status'] = 'PENDING'
-    books.to_excel(BOOKS_FILE, index=False)
+    books.loc[_rows('books', books, 'id', book_id), 'status'] = 'PENDING'
+    _save_table('books', books, [Update({'id': book_id}, {'status': 'PENDING'})])
     
     # Create pending request
     tx_id = get_next_tx_id()
-    new_request = pd.DataFrame([{
+    new_request = SCHEMAS['pending'].frame([{
         'transaction_id': tx_id,
         'book_id': book_id,
         'book_title': book.iloc[0]['title'],
@@ -377,17 +987,18 @@ def lend_book_request(book_id, user_name, mobile, email, member_id=None):
     }])
     
     pending = pd.concat([pending, new_request], ignore_index=True)
-    pending.to_excel(PENDING_FILE, index=False)
+    _save_table('pending', pending, [Insert(new_request.to_dict('records'))])
     
     return True, f"Lend request sent for {user_name} ({final_user_id})! Please wait for Admin approval."
 
 
+@_serialized
 def express_interest(book_id, book_title, user_name, mobile, email):
     """Record user interest in a lent book"""
-    _, _, _, pending = load_data()
+    pending = get_pending()
     
     tx_id = get_next_tx_id()
-    new_interest = pd.DataFrame([{
+    new_interest = SCHEMAS['pending'].frame([{
         'transaction_id': tx_id,
         'book_id': book_id,
         'book_title': book_title,
@@ -401,12 +1012,15 @@ def express_interest(book_id, book_title, user_name, mobile, email):
     }])
     
     pending = pd.concat([pending, new_interest], ignore_index=True)
-    pending.to_excel(PENDING_FILE, index=False)
+    _save_table('pending', pending, [Insert(new_interest.to_dict('records'))])
     
     return True, "Interest recorded! Admin will notify you when available."
 
+@_serialized
 def approve_lend(transaction_id):
-    books, _, transactions, pending = load_data()
+    books = _load_table('books')
+    transactions = get_transactions()
+    pending = get_pending()
     
     # Find pending request
     request = pending[pending['transaction_id'] == transaction_id]
@@ -416,23 +1030,25 @@ def approve_lend(transaction_id):
     book_id = request.iloc[0]['book_id']
     
     # Update book status
-    books.loc[books['id'] == book_id, 'status'] = 'LENT'
-    books.to_excel(BOOKS_FILE, index=False)
+    books.loc[_rows('books', books, 'id', book_id), 'status'] = 'LENT'
+    _save_table('books', books, [Update({'id': book_id}, {'status': 'LENT'})])
     
     # Move to transactions
     request_copy = request.copy()
     request_copy['status'] = 'ACTIVE'
     transactions = pd.concat([transactions, request_copy], ignore_index=True)
-    transactions.to_excel(TRANSACTIONS_FILE, index=False)
+    _save_table('transactions', transactions, [Insert(request_copy.to_dict('records'))])
     
     # Remove from pending
     pending = pending[pending['transaction_id'] != transaction_id]
-    pending.to_excel(PENDING_FILE, index=False)
+    _save_table('pending', pending, [Delete({'transaction_id': transaction_id})])
     
     return True, "Lend request approved. Moved to Active Transactions."
 
+@_serialized
 def reject_lend(transaction_id):
-    books, _, _, pending = load_data()
+    books = _load_table('books')
+    pending = get_pending()
     
     # Find pending request
     request = pending[pending['transaction_id'] == transaction_id]
@@ -442,34 +1058,36 @@ def reject_lend(transaction_id):
     book_id = request.iloc[0]['book_id']
     
     # Release book
-    books.loc[books['id'] == book_id, 'status'] = 'AVAILABLE'
-    books.to_excel(BOOKS_FILE, index=False)
+    books.loc[_rows('books', books, 'id', book_id), 'status'] = 'AVAILABLE'
+    _save_table('books', books, [Update({'id': book_id}, {'status': 'AVAILABLE'})])
     
     # Remove from pending
     pending = pending[pending['transaction_id'] != transaction_id]
-    pending.to_excel(PENDING_FILE, index=False)
+    _save_table('pending', pending, [Delete({'transaction_id': transaction_id})])
     
     return True, "Lend request rejected."
 
+@_serialized
 def request_return(book_id, mobile):
-    _, _, transactions, _ = load_data()
-    
-    input_mobile = normalize_mobile(mobile)
-    
-    # Find active transaction
-    active = transactions[(transactions['book_id'] == book_id) & 
-                         (transactions['status'] == 'ACTIVE')]
-    
-    for idx, row in active.iterrows():
-        if normalize_mobile(row['user_mobile']) == input_mobile:
-            transactions.loc[idx, 'status'] = 'RETURN_REQUESTED'
-            transactions.to_excel(TRANSACTIONS_FILE, index=False)
+    transactions = get_transactions()
+    
+    # Find this mobile's record among the book's active loans
+    mobiles = transactions['user_mobile_norm']
+    for pos in _find('transactions', transactions, ('book_id', 'status'), (book_id, 'ACTIVE')):
+        if mobiles.iat[pos] == normalize_mobile(mobile):
+            transactions.iloc[pos, transactions.columns.get_loc('status')] = 'RETURN_REQUESTED'
+            _save_table('transactions', transactions, [Update(
+                {'transaction_id': transactions['transaction_id'].iat[pos],
+                 'book_id': book_id, 'status': 'ACTIVE'},
+                {'status': 'RETURN_REQUESTED'})])
             return True, "Return requested. Waiting for Admin approval."
     
     return False, "Active transaction not found for this book and mobile."
 
+@_serialized
 def approve_return(transaction_id):
-    books, _, transactions, _ = load_data()
+    books = _load_table('books')
+    transactions = get_transactions()
     
     # Find transaction
     tx = transactions[transactions['transaction_id'] == transaction_id]
@@ -479,72 +1097,103 @@ def approve_return(transaction_id):
     book_id = tx.iloc[0]['book_id']
     
     # Update transaction
+    return_date = datetime.now().strftime('%Y-%m-%d')
     transactions.loc[transactions['transaction_id'] == transaction_id, 'status'] = 'RETURNED'
-    transactions.loc[transactions['transaction_id'] == transaction_id, 'return_date'] = datetime.now().strftime('%Y-%m-%d')
-    transactions.to_excel(TRANSACTIONS_FILE, index=False)
+    transactions.loc[transactions['transaction_id'] == transaction_id, 'return_date'] = return_date
+    _save_table('transactions', transactions, [Update(
+        {'transaction_id': transaction_id}, {'status': 'RETURNED', 'return_date': return_date})])
     
     # Release book
-    books.loc[books['id'] == book_id, 'status'] = 'AVAILABLE'
-    books.to_excel(BOOKS_FILE, index=False)
+    books.loc[_rows('books', books, 'id', book_id), 'status'] = 'AVAILABLE'
+    _save_table('books', books, [Update({'id': book_id}, {'status': 'AVAILABLE'})])
     
     return True, "Return approved. Book is now available."
 
+def search_active_loans(book_query="", user_query="", order='borrow_date', descending=False):
+    """Active loans whose book title or ID contains `book_query` and whose
+    member name or mobile contains `user_query`, sorted by the `order` column.
+
+    Matching is case-insensitive and literal; empty queries match every
+    loan. Served from the active-loan index, so the cost follows the loans
+    out rather than the transaction history.
+    """
+    signature = STORAGE.signature('transactions')
+    transactions = _load_table('transactions')
+    index = _table_index('transactions', 'loans')
+    positions = index.search(book_query, LOAN_BOOK_SEARCH)
+    if user_query:
+        found = set(index.search(user_query, LOAN_USER_SEARCH))
+        positions = [pos for pos in positions if pos in found]
+    searches = [(search_index.normalize(query), fields) for query, fields
+                in ((book_query, LOAN_BOOK_SEARCH), (user_query, LOAN_USER_SEARCH))]
+
+    def still_matches(pos, row):
+        return row['status'] == 'ACTIVE' and all(
+            any(needle in search_index.normalize(row[f]) for f in fields)
+            for needle, fields in searches)
+
+    return _matched_rows('transactions', signature, transactions,
+                         index.sort(positions, order, descending), still_matches)
+
 def get_user_history(identifier):
     if not identifier:
         return []
     
-    _, _, transactions, pending = load_data()
-    
-    # We treat identifier as either mobile, ID, or Name
-    # Normalize if it looks like a mobile (digits)
-    check_mobile = None
-    check_id = str(identifier).strip().upper()
-    check_name = str(identifier).strip().lower()
+    transactions = get_transactions()
+    pending = get_pending()
+    
+    # The identifier may be a mobile, a member ID or a name. The circulation
+    # indexes give each match directly, so only this member's records are read.
+    keys = {
+        'user_mobile_norm': normalize_mobile(identifier),
+        'user_id': identifier,
+        'user_name': identifier,
+    }
+    sources = [
+        ('transactions', transactions, ('ACTIVE', 'RETURN_REQUESTED')),  # Active/Return Requested
+        ('pending', pending, ('BORROW_REQUESTED',)),                     # Pending borrows
+    ]
     
-    # Simple heuristic: if it contains only digits and length > 5, treat as mobile primarily
-    try:
-        check_mobile = normalize_mobile(identifier)
-    except:
-        pass
-
     results = []
-    
-    # Helper to match row
-    def match_row(row):
-        # Check Mobile
-        if check_mobile and normalize_mobile(row['user_mobile']) == check_mobile:
-            return True
-        # Check ID
-        if 'user_id' in row and str(row['user_id']).strip().upper() == check_id:
-            return True
-        # Check Name (Case-insensitive match)
-        if 'user_name' in row and str(row['user_name']).strip().lower() == check_name:
-            return True
-        return False
-    
-    # Active/Return Requested transactions
-    active = transactions[transactions['status'].isin(['ACTIVE', 'RETURN_REQUESTED'])]
-    for _, row in active.iterrows():
-        if match_row(row):
-            results.append(row.to_dict())
-    
-    # Pending borrows
-    pending_borrows = pending[pending['status'] == 'BORROW_REQUESTED']
-    for _, row in pending_borrows.iterrows():
-        if match_row(row):
-            results.append(row.to_dict())
+    for name, df, statuses in sources:
+        positions = set()
+        for column, key in keys.items():
+            positions.update(_find(name, df, column, key))
+        status = df['status']
+        for pos in sorted(positions):
+            if status.iat[pos] in statuses:
+                results.append(df.iloc[pos].to_dict())
     
     return results
 
+@_serialized
 def update_legacy_mobile(transaction_id, new_mobile):
-    _, _, transactions, _ = load_data()
+    transactions = get_transactions()
     
     if transaction_id in transactions['transaction_id'].values:
-        transactions.loc[transactions['transaction_id'] == transaction_id, 'user_mobile'] = str(new_mobile)
-        transactions.to_excel(TRANSACTIONS_FILE, index=False)
+        mobile_values = {'user_mobile': str(new_mobile),
+                         'user_mobile_norm': normalize_mobile(new_mobile)}
+        for col, val in mobile_values.items():
+            transactions.loc[transactions['transaction_id'] == transaction_id, col] = val
+        _save_table('transactions', transactions,
+                    [Update({'transaction_id': transaction_id}, mobile_values)])
         return True, "Mobile number updated successfully."
     return False, "Transaction ID not found."
 
+@_serialized
+def compact_journal():
+    """Folds the transactions journal into a fresh checkpoint workbook.
+
+    Staged as a full rewrite (which is a checkpoint) like any other save, so
+    it only holds what the unit of work commits and rolls back with it. A
+    no-op on backends that keep no journal.
+    """
+    if 'transactions' not in STORAGE.journaled:
+        return True, f"Nothing to compact: the {STORAGE.name} backend keeps no journal."
+    transactions = get_transactions()
+    _save_table('transactions', transactions)
+    return True, f"Checkpointed {len(transactions)} transactions."
+
 def sync_to_master():
     """Backup data to source/master.xlsx"""
     try:
@@ -555,59 +1204,54 @@ def sync_to_master():
     except Exception as e:
         return False, str(e)
 
-def _renumber_books_internal(books, transactions, pending):
-    """Helper to renumber books sequentially GDL-001..."""
-    # Extract numeric part for sorting
-    import re
-    def get_num(x):
-        m = re.search(r'GDL-(\d+)', str(x))
-        return int(m.group(1)) if m else 999999
-    
-    books['num_id'] = books['id'].apply(get_num)
-    books = books.sort_values('num_id').drop(columns=['num_id']).reset_index(drop=True)
-    
-    id_map = {} # old -> new
-    
-    for idx, row in books.iterrows():
-        old_id = row['id']
-        new_id = f"GDL-{str(idx + 1).zfill(3)}"
-        
-        if old_id != new_id:
-            books.at[idx, 'id'] = new_id
-            id_map[old_id] = new_id
-            
-    # Update references
-    if id_map:
-        # Transactions
-        transactions['book_id'] = transactions['book_id'].replace(id_map)
-        # Pending
-        pending['book_id'] = pending['book_id'].replace(id_map)
-        
-    return books, transactions, pending
-
-def _renumber_members_internal(users, transactions, pending):
-    """Helper to renumber members sequentially MEM-001..."""
-    import re
-    def get_num(x):
-        m = re.search(r'MEM-(\d+)', str(x))
-        return int(m.group(1)) if m else 999999
-        
-    users['num_id'] = users['user_id'].apply(get_num)
-    users = users.sort_values('num_id').drop(columns=['num_id']).reset_index(drop=True)
-    
-    id_map = {}
-    
-    for idx, row in users.iterrows():
-        old_id = row['user_id']
-        new_id = f"MEM-{str(idx + 1).zfill(3)}"
-        
-        if old_id != new_id:
-            users.at[idx, 'user_id'] = new_id
-            id_map[old_id] = new_id
-            
-    # Update references
-    if id_map:
-        transactions['user_id'] = transactions['user_id'].replace(id_map)
-        pending['user_id'] = pending['user_id'].replace(id_map)
-        
-    return users, transactions, pending
+# --- ID Renumbering ---
+# Deletes only mark rows as DELETED, so IDs never change while the app runs.
+# renumber_ids() is the offline compaction: it drops the tombstones and
+# renumbers books and members GDL-001.. / MEM-001.. in ID order, rewriting
+# the references in transactions and pending in one pass per table. History
+# rows of removed books and members keep their old IDs, as they always have.
+# Run it with renumber_ids.py while the app is stopped.
+
+@_serialized
+def renumber_ids():
+    """Removes deleted books and members and closes the gaps in their IDs."""
+    books, book_map = _renumber('books', _load_table('books'))
+    users, user_map = _renumber('users', _load_table('users'))
+    transactions = _remap_ids(get_transactions(), {'book_id': book_map, 'user_id': user_map})
+    pending = _remap_ids(get_pending(), {'book_id': book_map, 'user_id': user_map})
+
+    _reset_sequence('books', len(books))
+    _reset_sequence('users', len(users))
+    _save_table('books', books)
+    _save_table('users', users)
+    _save_table('transactions', transactions)
+    _save_table('pending', pending)
+    return True, (f"Renumbered {len(books)} books ({len(book_map)} IDs changed) and "
+                  f"{len(users)} members ({len(user_map)} IDs changed).")
+
+def deleted_counts():
+    """{'books': n, 'users': n} tombstones that renumber_ids() would remove."""
+    return {table: int((_load_table(table)[SCHEMAS[table].tombstone] == DELETED).sum())
+            for table in ('books', 'users')}
+
+def _renumber(table, df):
+    """Live rows of `table` with sequential IDs, and the {old: new} ID map."""
+    schema = SCHEMAS[table]
+    df = schema.live(df)
+    # Stable sort by ID number; IDs without one go last
+    order = _id_numbers(df[schema.key], schema.id_prefix).fillna(float('inf')).argsort(kind='stable')
+    df = df.iloc[order].reset_index(drop=True)
+
+    numbers = pd.Series(range(1, len(df) + 1), dtype='int64')
+    new_ids = schema.id_prefix + '-' + numbers.astype(str).str.zfill(3)
+    changed = df[schema.key] != new_ids
+    id_map = dict(zip(df[schema.key][changed], new_ids[changed]))
+    df[schema.key] = new_ids
+    return df, id_map
+
+def _remap_ids(df, maps):
+    """Applies {column: {old: new}} maps; IDs not in a map are kept."""
+    for col, id_map in maps.items():
+        if id_map:
+            df[col] = df[col].map(id_map).fillna(df[col])
+    return df
@@ -0,0 +1,201 @@
+import numpy as np
+from search_index import N, OverlayIndex, normalize
+
+# The loans currently out, for the admin dashboard.
+#
+# Only the rows of the transactions table whose status is ACTIVE are kept,
+# each with its raw values (to match Update where-clauses) and its
+# normalised ones (for substring tests and as sort keys). Every substring of
+# up to N characters of a search field maps to the loans containing it, so a
+# one- or two-letter query is a single lookup and a longer one intersects
+# its trigrams before the substring test. Searching and sorting therefore
+# cost the matching loans, not the transaction history.
+#
+# approve_lend inserts a loan, request_return and approve_return move one
+# out of the view, and member or legacy mobile fixes rewrite it. Short
+# substrings hold most loans, so changed loans go to the overlay (see
+# OverlayIndex in search_index.py) rather than into the shared postings.
+# Besides keyed Updates, an Update matching on any kept columns is followed
+# unless it could bring a row into the view.
+
+STATUS = 'status'
+ACTIVE = 'ACTIVE'
+
+_EMPTY = frozenset()
+
+
+def substrings(text):
+    """Every substring of `text` of up to N characters."""
+    return {text[i:i + n] for n in range(1, N + 1) for i in range(len(text) - n + 1)}
+
+
+class LoanIndex(OverlayIndex):
+    """Substring postings and sort keys over the active loans of a table.
+
+    `key` is the table's primary key column; `fields` is (search fields,
+    other columns kept to sort by or to match updates on).
+    """
+
+    def __init__(self, key, fields):
+        self.fields, kept = (tuple(f) for f in fields)
+        self.columns = tuple(dict.fromkeys((key, STATUS, *self.fields, *kept)))
+        super().__init__(key, self.columns)
+        self.base_loans = {}                               # pos -> ({column: value}, {column: normalised})
+        self.base_postings = {f: {} for f in self.fields}  # field -> {substring: {pos, ...}}
+        # `changed` holds pos -> (loan, texts), or None once the loan leaves the view
+        # and base_keys only the loans active in the base
+        self.postings = {f: {} for f in self.fields}       # field -> {substring: {changed pos, ...}}
+
+    @classmethod
+    def build(cls, df, key, fields):
+        index = cls(key, fields)
+        active = np.flatnonzero(np.asarray(df[STATUS] == ACTIVE, dtype=bool))
+        columns = {c: df[c].array.take(active).tolist() for c in index.columns if c in df}
+        for i, pos in enumerate(active.tolist()):
+            loan = {c: values[i] for c, values in columns.items()}
+            index.base_loans[pos] = (loan, {c: normalize(v) for c, v in loan.items()})
+        index._set_base(index.base_loans)
+        index.rows = len(df)
+        return index
+
+    def search(self, query, fields):
+        """Positions of the active loans where any of `fields` contains `query`.
+
+        Matching is case-insensitive and literal; an empty query matches
+        every loan. Positions are in table order.
+        """
+        text = normalize(query)
+        if not text:
+            hits = {pos for pos in self.base_loans if pos not in self.changed}
+            hits.update(pos for pos, entry in self.changed.items() if entry is not None)
+            return sorted(hits)
+        hits = set()
+        for field in fields:
+            base = _matches(self.base_postings[field], text, field, self.base_loans)
+            if self.changed:
+                base = [pos for pos in base if pos not in self.changed]
+                hits.update(_matches(self.postings[field], text, field, self.changed))
+            hits.update(base)
+        return sorted(hits)
+
+    def sort(self, positions, column, descending=False):
+        """`positions` ordered by the normalised `column`, ties in table order."""
+        return sorted(positions, key=lambda pos: self._loan(pos)[1][column], reverse=descending)
+
+    def _copy_overlay(self, other):
+        other.postings = {f: {s: set(p) for s, p in postings.items()}
+                          for f, postings in self.postings.items()}
+
+    def _insert(self, pos, record):
+        if record.get(STATUS) == ACTIVE:
+            self._set_loan(pos, {c: record.get(c) for c in self.columns})
+
+    def _update(self, change):
+        if not set(change.values) & self.watched:
+            return True
+        if (not set(change.where) <= self.watched or self.key in change.values
+                or change.values.get(STATUS) == ACTIVE and change.where.get(STATUS) != ACTIVE):
+            return False  # rows outside the view only matter if they become active
+        for pos in self._where(change.where):
+            self._set(pos, change.values)
+        return True
+
+    def _set(self, pos, values):
+        loan = {**self._loan(pos)[0], **{c: v for c, v in values.items() if c in self.watched}}
+        self._set_loan(pos, loan if loan[STATUS] == ACTIVE else None)
+
+    def _loan(self, pos):
+        """(loan, texts) of the loan at `pos`, None if it is not active."""
+        if pos in self.changed:
+            return self.changed[pos]
+        return self.base_loans.get(pos)
+
+    def _where(self, where):
+        """Positions of the active loans matching an Update's `where`."""
+        if self.key in where:
+            candidates = self.positions(where[self.key])
+        else:
+            candidates = self.search("", ())
+        found = []
+        for pos in candidates:
+            entry = self._loan(pos)
+            if entry is not None and all(entry[0].get(c) == v for c, v in where.items()):
+                found.append(pos)
+        return found
+
+    def _set_loan(self, pos, loan):
+        """Puts `loan` at `pos` in the overlay (None: `pos` leaves the view)."""
+        old = self.changed.get(pos)
+        if old is not None:
+            for field in self.fields:
+                postings = self.postings[field]
+                for sub in substrings(old[1][field]):
+                    entry = postings[sub]
+                    entry.discard(pos)
+                    if not entry:
+                        del postings[sub]
+        if loan is None:
+            self.changed[pos] = None
+            return
+        texts = {c: normalize(v) for c, v in loan.items()}
+        for field in self.fields:
+            postings = self.postings[field]
+            for sub in substrings(texts[field]):
+                postings.setdefault(sub, set()).add(pos)
+        self.changed[pos] = (loan, texts)
+
+    def _set_base(self, loans):
+        postings = {f: {} for f in self.fields}
+        keys = {}
+        for pos, (loan, texts) in loans.items():
+            for field in self.fields:
+                field_postings = postings[field]
+                for sub in substrings(texts[field]):
+                    entry = field_postings.get(sub)
+                    if entry is None:
+                        field_postings[sub] = {pos}
+                    else:
+                        entry.add(pos)
+            keys[loan[self.key]] = keys.get(loan[self.key], ()) + (pos,)
+        self.base_loans, self.base_postings, self.base_keys = loans, postings, keys
+
+    def _fold(self):
+        loans = dict(self.base_loans)
+        base_postings = {}
+        for field in self.fields:
+            postings = dict(self.base_postings[field])
+            copied = set()
+            for pos, entry in self.changed.items():
+                old = self.base_loans.get(pos)
+                before = substrings(old[1][field]) if old is not None else set()
+                after = substrings(entry[1][field]) if entry is not None else set()
+                for sub in before ^ after:
+                    if sub not in copied:
+                        postings[sub] = set(postings.get(sub, ()))
+                        copied.add(sub)
+                    if sub in after:
+                        postings[sub].add(pos)
+                    else:
+                        postings[sub].discard(pos)
+            base_postings[field] = {s: p for s, p in postings.items() if p}
+        for pos, entry in self.changed.items():
+            if entry is None:
+                loans.pop(pos, None)
+            else:
+                loans[pos] = entry
+        keys = {}  # of the loans still active
+        for value, positions in self.base_keys.items():
+            positions = tuple(pos for pos in positions if pos in loans)
+            if positions:
+                keys[value] = positions
+        self.base_loans, self.base_postings, self.base_keys = loans, base_postings, keys
+        self.postings = {f: {} for f in self.fields}
+
+
+def _matches(postings, text, field, loans):
+    """Positions in `postings` whose `field` text (in `loans`) contains `text`."""
+    if len(text) <= N:
+        return postings.get(text, _EMPTY)
+    sets = sorted((postings.get(text[i:i + N], _EMPTY) for i in range(len(text) - N + 1)),
+                  key=len)
+    return [pos for pos in sets[0].intersection(*sets[1:]) if text in loans[pos][1][field]]
@@ -0,0 +1,132 @@
+import re
+from bisect import bisect_left
+
+from search_index import LAST, NgramIndex, OverlayIndex, normalize
+
+# Member search for the admin Manage Members tab.
+#
+# A query finds the members whose name or email contains it (trigram
+# postings, an NgramIndex), whose member ID starts with it ("mem-01", or just
+# the number: "12" for MEM-012), and, for a query that looks like a phone
+# number, whose mobile starts or ends with its digits ("4321" for the last
+# four digits). IDs and mobiles are kept in sorted arrays searched with
+# bisect; every mobile suffix of up to SUFFIX digits maps to the members
+# holding it, and longer suffixes are checked within those. Members changed
+# since the arrays were built are checked one by one.
+
+SUFFIX = 4
+
+_PHONE = re.compile(r'[\d\s+\-()]+')
+_NUMBER = re.compile(r'(\d+)$')
+
+
+def id_keys(value):
+    """The forms of a member ID a query can be a prefix of: 'mem-012' and '12'."""
+    text = normalize(value).strip()
+    number = _NUMBER.search(text)
+    keys = {text} if text else set()
+    if number:
+        keys.add(number.group(1).lstrip('0') or '0')
+    return keys
+
+def digits(value):
+    return re.sub(r'\D', '', normalize(value))
+
+def phone_digits(query):
+    """The digits of `query` if it looks like (part of) a phone number, else ''."""
+    return digits(query) if _PHONE.fullmatch(query) else ""
+
+def matches(query, texts, user_id, mobile):
+    """Whether a member with these `texts` (name, email), ID and mobile matches `query`."""
+    text, number = normalize(query).strip(), phone_digits(query)
+    return (any(normalize(query) in normalize(t) for t in texts)
+            or bool(text) and any(key.startswith(text) for key in id_keys(user_id))
+            or bool(number) and (digits(mobile).startswith(number)
+                                 or digits(mobile).endswith(number)))
+
+
+class MemberIndex(OverlayIndex):
+    """Name/email trigrams, an ID prefix map and a mobile digit-suffix index.
+
+    `key` is the member ID column; `fields` is (text fields, mobile field).
+    """
+
+    def __init__(self, key, fields):
+        text_fields, self.mobile = fields
+        super().__init__(key, (self.mobile,))
+        self.text = NgramIndex(key, text_fields)
+        self.base_values = []    # pos -> (member ID, mobile digits)
+        self.base_ids = []       # sorted [(id key, pos)]
+        self.base_mobiles = []   # sorted [(mobile digits, pos)]
+        self.base_suffixes = {}  # last 1..SUFFIX mobile digits -> [pos, ...]
+        # `changed` holds pos -> (member ID, mobile digits)
+
+    @classmethod
+    def build(cls, df, key, fields):
+        index = cls(key, fields)
+        index.text = NgramIndex.build(df, key, index.text.fields)
+        user_ids = df[key].tolist()
+        index._build_keys(user_ids)
+        index._set_base(list(zip(user_ids, map(digits, df[index.mobile].tolist()))))
+        return index
+
+    def search(self, query):
+        """Positions of the members matching `query` (see matches()), in table order."""
+        hits = set(self.text.search(query, self.text.fields))
+        text, number = normalize(query).strip(), phone_digits(query)
+        if not text:
+            return sorted(hits)
+        found = [pos for _, pos in _prefixed(self.base_ids, text)]
+        if number:
+            found += [pos for _, pos in _prefixed(self.base_mobiles, number)]
+            if len(number) <= SUFFIX:
+                found += self.base_suffixes.get(number, ())
+            else:
+                values = self.base_values
+                found += [pos for pos in self.base_suffixes.get(number[-SUFFIX:], ())
+                          if values[pos][1].endswith(number)]
+        hits.update(pos for pos in found if pos not in self.changed)
+        for pos, (user_id, mobile) in self.changed.items():
+            if (any(key.startswith(text) for key in id_keys(user_id))
+                    or number and (mobile.startswith(number) or mobile.endswith(number))):
+                hits.add(pos)
+        return sorted(hits)
+
+    def apply(self, changes, rows):
+        return self.text.apply(changes, rows) and super().apply(changes, rows)
+
+    def _copy_overlay(self, other):
+        other.text = self.text.copy()
+
+    def _insert(self, pos, record):
+        self.changed[pos] = (record.get(self.key), digits(record.get(self.mobile)))
+
+    def _set(self, pos, values):
+        user_id, _ = self.changed.get(pos) or self.base_values[pos]
+        self.changed[pos] = (user_id, digits(values[self.mobile]))
+
+    def _set_base(self, values):
+        self.base_values = values
+        self.base_ids = sorted((k, pos) for pos, (user_id, _) in enumerate(values)
+                               for k in id_keys(user_id))
+        self.base_mobiles = sorted((mobile, pos) for pos, (_, mobile) in enumerate(values) if mobile)
+        suffixes = {}
+        for pos, (_, mobile) in enumerate(values):
+            for size in range(1, min(SUFFIX, len(mobile)) + 1):
+                suffixes.setdefault(mobile[-size:], []).append(pos)
+        self.base_suffixes = suffixes
+
+    def _fold(self):
+        values = list(self.base_values)
+        for pos in sorted(self.changed):
+            if pos < len(values):
+                values[pos] = self.changed[pos]
+            else:
+                values.append(self.changed[pos])
+        self._set_base(values)
+
+
+def _prefixed(entries, prefix):
+    """The (text, pos) `entries` whose text starts with `prefix`."""
+    lo = bisect_left(entries, (prefix,))
+    return entries[lo:bisect_left(entries, (prefix + LAST,), lo)]
@@ -0,0 +1,37 @@
+import os
+import sys
+from storage import ExcelStorage, SQLiteStorage, copy_tables
+
+# One-shot conversion between the Excel workbooks in data/ and the SQLite
+# database used when LIBRARY_STORAGE=sqlite.
+#
+#   python migrate_to_sqlite.py           data/*.xlsx -> data/library.db
+#   python migrate_to_sqlite.py --export  data/library.db -> data/*.xlsx
+
+DATA_DIR = "data"
+DB_FILE = os.path.join(DATA_DIR, "library.db")
+
+def migrate():
+    if os.path.exists(DB_FILE):
+        print(f"'{DB_FILE}' already exists. Remove it first to re-run the migration.")
+        return
+
+    counts = copy_tables(ExcelStorage(DATA_DIR), SQLiteStorage(DB_FILE, create=True))
+    for table, count in counts.items():
+        print(f"Imported {count} rows into '{table}'.")
+    print(f"Migration complete. Start the app with LIBRARY_STORAGE=sqlite to use '{DB_FILE}'.")
+
+def export():
+    if not os.path.exists(DB_FILE):
+        print(f"'{DB_FILE}' not found.")
+        return
+
+    counts = copy_tables(SQLiteStorage(DB_FILE), ExcelStorage(DATA_DIR))
+    for table, count in counts.items():
+        print(f"Exported {count} rows from '{table}'.")
+
+if __name__ == "__main__":
+    if "--export" in sys.argv[1:]:
+        export()
+    else:
+        migrate()
@@ -0,0 +1,131 @@
+import heapq
+import re
+import unicodedata
+
+from search_index import NgramIndex, normalize
+
+# Fuzzy search over Tanglish (romanised Tamil) fields.
+#
+# The same Tamil word is spelt many ways in Latin letters: "Ponniyin Selvan",
+# "ponniyan selvan", "poniyin selvam". Each text is reduced to phonetic word
+# keys that collapse those variants (long and short vowels, aspirated and
+# plain consonants, doubled letters, retroflex marks such as n/ṇ, a final
+# m/n). Candidates are the rows sharing a word skeleton (the key without
+# its vowels) with the query. The rows sharing the most skeletons are
+# shortlisted, ranked by edit distance between the keys, and the best k are
+# kept in a bounded heap.
+
+TOP_K = 50
+SHORTLIST = 8  # rows ranked by edit distance per result asked for
+
+# Spellings of one Tamil sound -> a single letter (longest match first)
+_SOUNDS = {
+    'aa': 'a', 'ee': 'i', 'ii': 'i', 'ea': 'e', 'oo': 'u', 'uu': 'u', 'oa': 'o', 'ou': 'u',
+    'zh': 'l', 'lh': 'l', 'th': 't', 'dh': 't', 'sh': 's', 'ch': 's',
+    'kh': 'k', 'gh': 'k', 'bh': 'p', 'ph': 'p', 'ng': 'n', 'gn': 'n',
+    'd': 't', 'g': 'k', 'b': 'p', 'c': 's', 'j': 's', 'z': 's', 'f': 'p', 'q': 'k', 'w': 'v',
+}
+_SOUND = re.compile('|'.join(sorted(_SOUNDS, key=len, reverse=True)))
+_REPEATED = re.compile(r'(.)\1+')
+_VOWELS = re.compile(r'[aeiou]')
+
+
+def phonetic_key(value):
+    """Phonetic keys of the words of `value`, joined by spaces."""
+    text = unicodedata.normalize('NFKD', normalize(value))
+    text = text.encode('ascii', 'ignore').decode()  # drops marks: ṇ -> n
+    words = []
+    for word in re.findall(r'[a-z0-9]+', text):
+        word = _SOUND.sub(lambda m: _SOUNDS[m.group()], word)
+        word = _REPEATED.sub(r'\1', word)
+        if len(word) > 1 and word.endswith('m'):
+            word = word[:-1] + 'n'
+        words.append(word)
+    return " ".join(words)
+
+def skeletons(key):
+    """Word skeletons of a phonetic key: first letter plus the consonants."""
+    return {word[0] + _VOWELS.sub('', word[1:]) for word in key.split()}
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance of `a` and `b`, or `limit` + 1 if it is more."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class PhoneticIndex(NgramIndex):
+    """Word skeleton postings over phonetic keys of `fields`, for fuzzy search.
+
+    Kept in sync like NgramIndex; texts are phonetic keys instead of
+    lower-cased text.
+    """
+
+    normalize = staticmethod(phonetic_key)
+    tokens = staticmethod(skeletons)
+
+    def ranked(self, query, fields, k=TOP_K, keep=None):
+        """Positions of the best `k` fuzzy matches for `query`, best first.
+
+        A row's score is the summed edit distance of each query word to its
+        closest word in the best of `fields`; a query word further than a
+        third of its length from every word adds its own length. Rows that
+        match no query word are left out, as are positions `keep` rejects.
+        """
+        words = phonetic_key(query).split()
+        if not words:
+            return []
+        query_skeletons = skeletons(" ".join(words))
+        shared = {}  # candidate pos -> number of query skeletons it shares
+        for field in fields:
+            for skeleton in query_skeletons:
+                for pos in self._positions(field, skeleton):
+                    shared[pos] = shared.get(pos, 0) + 1
+        if keep is not None:
+            shared = {pos: n for pos, n in shared.items() if keep(pos)}
+        shortlist = heapq.nlargest(k * SHORTLIST, shared, key=lambda pos: (shared[pos], -pos))
+
+        distances = {}  # (query word, text word) -> edit distance, as words repeat
+        scored = (self._score(words, fields, pos, distances) for pos in shortlist)
+        best = heapq.nsmallest(k, (entry for entry in scored if entry is not None))
+        return [pos for _, pos in best]
+
+    def _positions(self, field, token):
+        base = self.base_postings[field].get(token, ())
+        if self.changed:
+            return [pos for pos in base if pos not in self.changed] + \
+                list(self.postings[field].get(token, ()))
+        return base
+
+    def _score(self, words, fields, pos, distances):
+        best = None
+        for field in fields:
+            text_words = self.text(field, pos).split()
+            if not text_words:
+                continue
+            score, matched = 0, False
+            for word in words:
+                limit = len(word) // 3
+                distance = limit + 1
+                for text_word in text_words:
+                    pair = (word, text_word)
+                    if pair not in distances:
+                        distances[pair] = edit_distance(word, text_word, limit)
+                    distance = min(distance, distances[pair])
+                if distance <= limit:
+                    score += distance
+                    matched = True
+                else:
+                    score += len(word)
+            if matched and (best is None or score < best):
+                best = score
+        return None if best is None else (best, pos)
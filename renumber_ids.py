@@ -0,0 +1,26 @@
+import sys
+import data_manager as dm
+
+# Offline ID compaction.
+#
+# Deleting a book or member only marks its row as DELETED, so IDs stay stable
+# while the library is running. This removes those rows and renumbers books
+# (GDL-001..) and members (MEM-001..) without gaps, updating transactions and
+# pending requests to match. Stop the app first, and relabel any books whose
+# ID changes.
+#
+#   python renumber_ids.py --yes
+
+def main():
+    counts = dm.deleted_counts()
+    print(f"{counts['books']} deleted books and {counts['users']} deleted members to remove.")
+
+    if "--yes" not in sys.argv[1:]:
+        print("Re-run with --yes to renumber.")
+        return
+
+    success, msg = dm.renumber_ids()
+    print(msg)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import pandas as pd
+
+# Declared schema for the four library tables.
+#
+# Every column is read as a string (IDs, mobiles and dates included), so
+# pandas never guesses dtypes: a mobile stays "9876543210" instead of turning
+# into 9876543210.0, and missing columns are added with their declared default
+# once per read instead of being re-coerced on every call.
+
+# Deleted books and members keep their row (a tombstone) with this status /
+# role, so their IDs stay taken until the offline renumbering job removes them.
+DELETED = 'DELETED'
+
+BOOK_STATUSES = ('AVAILABLE', 'PENDING', 'LENT', 'BORROWED', DELETED)
+TRANSACTION_STATUSES = ('ACTIVE', 'RETURN_REQUESTED', 'RETURNED')
+PENDING_STATUSES = ('BORROW_REQUESTED', 'INTERESTED')
+ROLES = ('ADMIN', 'USER', DELETED)
+
+
+def normalize_mobiles(mobiles):
+    """Vectorised normalize_mobile: stripped strings, legacy '.0' dropped, '' if missing."""
+    text = mobiles.astype(str).str.strip().str.removesuffix('.0')
+    return text.where(mobiles.notna(), "")
+
+
+class TableSchema:
+    """Column order, key and per-column rules of one table.
+
+    `enums` maps a column to its allowed values; `defaults` gives the value
+    used for a missing column or an empty cell; `id_prefix` is the prefix of
+    generated keys (GDL-001, MEM-001); `id_columns` maps every column holding
+    such IDs (the key or a reference to another table) to its prefix; `text`
+    lists the free-text columns (titles, names); `tombstone` is the column
+    set to DELETED when a row is deleted; `derived` maps a stored column to
+    (source column, vectorised function). Derived columns are lookup keys
+    kept up to date by every write path: conform() only fills the cells that
+    are missing, and they are recomputed whole when a workbook is parsed (it
+    may have been edited by hand).
+    """
+
+    def __init__(self, name, columns, key, unique_key=True, enums=None, defaults=None,
+                 id_prefix=None, id_columns=None, text=(), tombstone=None, derived=None):
+        self.name = name
+        self.columns = list(columns)
+        self.key = key
+        self.unique_key = unique_key
+        self.enums = enums or {}
+        self.defaults = defaults or {}
+        self.id_prefix = id_prefix
+        self.id_columns = id_columns or {}
+        self.text = list(text)
+        self.tombstone = tombstone
+        self.derived = derived or {}
+
+    @property
+    def dtypes(self):
+        return {col: str for col in self.columns}
+
+    def read_excel(self, path):
+        """Reads a workbook with declared dtypes and only the declared columns."""
+        columns = set(self.columns)
+        df = pd.read_excel(path, dtype=self.dtypes, usecols=lambda col: col in columns)
+        df = self.conform(df)
+        for col, (source, derive) in self.derived.items():
+            df[col] = derive(df[source])
+        return df
+
+    def conform(self, df):
+        """Returns `df` with exactly the declared columns, in order, as strings."""
+        df = df.reindex(columns=self.columns)
+        for col in self.columns:
+            values = df[col]
+            if values.dtype != _STRING_DTYPE:
+                df[col] = values.astype(str).where(values.notna())
+        for col, default in self.defaults.items():
+            if df[col].hasnans:
+                df[col] = df[col].fillna(default)
+        for col, (source, derive) in self.derived.items():
+            missing = df[col].isna()
+            if missing.any():
+                df.loc[missing, col] = derive(df.loc[missing, source])
+        return df
+
+    def frame(self, records):
+        """Builds typed rows (e.g. for an insert) from a list of dicts."""
+        return self.conform(pd.DataFrame(records, columns=self.columns))
+
+    def shown(self, df):
+        """`df` without the derived columns, for display."""
+        return df.drop(columns=[c for c in self.derived if c in df])
+
+    def live(self, df):
+        """`df` without tombstones."""
+        if self.tombstone is None:
+            return df
+        return df[df[self.tombstone] != DELETED]
+
+    def invalid_values(self, df):
+        """{column: values outside the declared enum} among the columns `df` has."""
+        problems = {}
+        for col, allowed in self.enums.items():
+            if col not in df:
+                continue
+            bad = set(df[col].dropna().unique()) - set(allowed)
+            if bad:
+                problems[col] = sorted(bad)
+        return problems
+
+
+# Empty-table dtype of a string column ("str" on pandas 3, object before).
+_STRING_DTYPE = pd.Series([], dtype=str).dtype
+
+SCHEMAS = {
+    'books': TableSchema(
+        'books',
+        ['id', 'title', 'author', 'donated_by', 'status', 'title_thanglish', 'author_thanglish'],
+        key='id',
+        enums={'status': BOOK_STATUSES},
+        defaults={'title_thanglish': "", 'author_thanglish': ""},
+        id_prefix='GDL',
+        id_columns={'id': 'GDL'},
+        text=['title', 'author', 'donated_by', 'title_thanglish', 'author_thanglish'],
+        tombstone='status'),
+    'users': TableSchema(
+        'users',
+        ['user_id', 'name', 'email', 'mobile', 'role', 'mobile_norm'],
+        key='user_id',
+        enums={'role': ROLES},
+        id_prefix='MEM',
+        id_columns={'user_id': 'MEM'},
+        text=['name', 'email'],
+        tombstone='role',
+        derived={'mobile_norm': ('mobile', normalize_mobiles)}),
+    'transactions': TableSchema(
+        'transactions',
+        ['transaction_id', 'book_id', 'book_title', 'user_id', 'user_name',
+         'user_email', 'user_mobile', 'borrow_date', 'return_date', 'status',
+         'user_mobile_norm'],
+        key='transaction_id', unique_key=False,
+        enums={'status': TRANSACTION_STATUSES},
+        id_columns={'book_id': 'GDL', 'user_id': 'MEM'},
+        text=['book_title', 'user_name', 'user_email'],
+        derived={'user_mobile_norm': ('user_mobile', normalize_mobiles)}),
+    'pending': TableSchema(
+        'pending',
+        # Column order of pending_approvals.xlsx
+        ['transaction_id', 'book_id', 'book_title', 'user_id', 'user_name',
+         'user_mobile', 'user_email', 'borrow_date', 'return_date', 'status',
+         'user_mobile_norm'],
+        key='transaction_id', unique_key=False,
+        enums={'status': PENDING_STATUSES},
+        id_columns={'book_id': 'GDL', 'user_id': 'MEM'},
+        text=['book_title', 'user_name', 'user_email'],
+        derived={'user_mobile_norm': ('user_mobile', normalize_mobiles)}),
+}
@@ -0,0 +1,320 @@
+from collections import OrderedDict
+
+import pandas as pd
+from storage import Insert, Update
+
+# Inverted n-gram index for substring search.
+#
+# Every text field is lower-cased and cut into overlapping trigrams; each
+# trigram maps to the set of row positions whose text contains it. A query
+# of three or more characters only has to look at the rows holding all of
+# its trigrams (the intersection of their posting sets), which are then
+# checked with a plain substring test. Shorter queries fall back to that
+# test over every row.
+#
+# Like TableIndex (table_index.py) positions are row positions in the table
+# as stored, and the index is kept in sync with Insert and keyed Update row
+# changes. Common trigrams hold most of the catalog, so rows changed since
+# the index was built go to a small overlay instead of the shared postings:
+# copy() only copies the overlay, and it is folded into new postings once it
+# holds MERGE_AT rows. OverlayIndex holds that bookkeeping for the other
+# indexes kept in sync this way (suggest, member and loan indexes).
+
+N = 3
+MERGE_AT = 512
+CACHE_SIZE = 32
+LAST = '\U0010ffff'  # sorts after every extension of a prefix
+
+_EMPTY = frozenset()
+
+def normalize(value):
+    """Text as indexed and searched: lower-cased, '' for a missing value."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    return str(value).lower()
+
+def grams(text):
+    """The distinct trigrams of `text` (none if it is shorter than N)."""
+    return {text[i:i + N] for i in range(len(text) - N + 1)}
+
+
+class OverlayIndex:
+    """Base of the indexes kept in sync with a table's row changes.
+
+    What was built from the table is shared between copies and never
+    changed; rows appended or changed since go to an overlay, `changed`
+    (pos -> the row as the subclass keeps it) plus whatever a subclass keeps
+    next to it, which is all copy() copies. As with TableIndex, copy() a
+    shared instance before apply().
+
+    `key` is the table's primary key column, used to find the rows an Update
+    touches; Updates setting none of the `watched` columns are skipped.
+    Subclasses fill in _insert(), _set() and _fold().
+    """
+
+    def __init__(self, key, watched):
+        self.key = key
+        self.watched = frozenset((key, *watched))
+        self.base_keys = {}  # key value -> (pos, ...)
+        self.changed = {}    # pos -> row, appended or changed since
+        self.keys = {}       # key value -> (appended pos, ...)
+        self.rows = 0
+
+    def copy(self):
+        other = type(self).__new__(type(self))
+        other.__dict__.update(self.__dict__)
+        other.changed = dict(self.changed)
+        other.keys = dict(self.keys)
+        self._copy_overlay(other)
+        return other
+
+    def positions(self, value):
+        """Positions of the rows whose key is `value`."""
+        return self.base_keys.get(value, ()) + self.keys.get(value, ())
+
+    def apply(self, changes, rows):
+        """As TableIndex.apply(); the overlay is folded in at MERGE_AT rows."""
+        for change in changes:
+            if isinstance(change, Insert):
+                for record in change.rows:
+                    pos, value = self.rows, record.get(self.key)
+                    self.keys[value] = self.keys.get(value, ()) + (pos,)
+                    self.rows += 1
+                    self._insert(pos, record)
+            elif not (isinstance(change, Update) and self._update(change)):
+                return False
+        if len(self.changed) >= MERGE_AT:
+            self._merge()
+        return self.rows == rows
+
+    def _build_keys(self, values):
+        """Maps each key value to its positions, `values` being the key column."""
+        for pos, value in enumerate(values):
+            self.base_keys[value] = self.base_keys.get(value, ()) + (pos,)
+        self.rows = len(values)
+
+    def _update(self, change):
+        """Applies an Update; False if it isn't keyed by `key` alone."""
+        if not set(change.values) & self.watched:
+            return True  # e.g. a status change: nothing indexed changes
+        if set(change.where) != {self.key} or self.key in change.values:
+            return False
+        for pos in self.positions(change.where[self.key]):
+            self._set(pos, change.values)
+        return True
+
+    def _merge(self):
+        """Folds the overlay into a new base (the old one stays with other copies)."""
+        keys = dict(self.base_keys)
+        for value, positions in self.keys.items():
+            keys[value] = keys.get(value, ()) + positions
+        self.base_keys, self.keys = keys, {}
+        self._fold()
+        self.changed = {}
+
+    def _copy_overlay(self, other):
+        """Gives `other` its own copy of the overlay kept next to `changed`."""
+
+    def _insert(self, pos, record):
+        """Adds the appended row `record` at `pos` to the overlay."""
+        raise NotImplementedError
+
+    def _set(self, pos, values):
+        """Applies the column `values` of a keyed Update to the row at `pos`."""
+        raise NotImplementedError
+
+    def _fold(self):
+        """Builds the new base from the old one and `changed`."""
+        raise NotImplementedError
+
+
+class NgramIndex(OverlayIndex):
+    """Trigram postings over the text `fields` of a table, for substring search."""
+
+    # How texts are normalised and cut into posting tokens
+    normalize = staticmethod(normalize)
+    tokens = staticmethod(grams)
+
+    def __init__(self, key, fields):
+        super().__init__(key, fields)
+        self.fields = tuple(fields)
+        self.base_texts = {f: [] for f in self.fields}     # field -> normalised text at each pos
+        self.base_postings = {f: {} for f in self.fields}  # field -> {gram: {pos, ...}}
+        # `changed` holds pos -> {field: text}
+        self.postings = {f: {} for f in self.fields}       # field -> {gram: {changed pos, ...}}
+
+    @classmethod
+    def build(cls, df, key, fields):
+        index = cls(key, fields)
+        index._build_keys(df[key].tolist())
+        for field in index.fields:
+            texts = [index.normalize(v) for v in df[field].tolist()]
+            index.base_postings[field] = _postings(enumerate(texts), index.tokens)
+            index.base_texts[field] = texts
+        return index
+
+    def search(self, query, fields):
+        """Positions of the rows where any of `fields` contains `query`, in table order.
+
+        Matching is case-insensitive and literal (no regular expressions).
+        """
+        query, query_grams = self.prepare(query)
+        hits = set()
+        for field in fields:
+            texts = self.base_texts[field]
+            if query_grams:
+                base = [pos for pos in _intersect(self.base_postings[field], query_grams)
+                        if query in texts[pos]]
+                changed = _intersect(self.postings[field], query_grams)
+            else:
+                base = [pos for pos, text in enumerate(texts) if query in text]
+                changed = self.changed
+            if self.changed:
+                base = [pos for pos in base if pos not in self.changed]
+                hits.update(pos for pos in changed if query in self.changed[pos][field])
+            hits.update(base)
+        return sorted(hits)
+
+    def filter(self, positions, query, fields):
+        """The `positions` where any of `fields` contains `query` (as in search())."""
+        query = self.prepare(query)[0]
+        if self.changed:
+            return [pos for pos in positions if any(query in self.text(f, pos) for f in fields)]
+        texts = [self.base_texts[f] for f in fields]
+        return [pos for pos in positions if any(query in t[pos] for t in texts)]
+
+    def cost(self, query, fields):
+        """Roughly how many texts search() checks for `query`."""
+        query_grams = self.prepare(query)[1]
+        if not query_grams:
+            return self.rows * len(fields)
+        return sum(min(len(self.base_postings[f].get(g, _EMPTY)) for g in query_grams)
+                   for f in fields)
+
+    def prepare(self, query):
+        """(`query` as matched against the normalised texts, its tokens)."""
+        query = self.normalize(query)
+        return query, self.tokens(query)
+
+    def contains(self, value, query):
+        """Whether the text `value` matches `query` as search() matches it."""
+        return self.prepare(query)[0] in self.normalize(value)
+
+    def text(self, field, pos):
+        row = self.changed.get(pos)
+        return self.base_texts[field][pos] if row is None else row[field]
+
+    def _copy_overlay(self, other):
+        other.postings = {f: {g: set(s) for g, s in p.items()} for f, p in self.postings.items()}
+
+    def _insert(self, pos, record):
+        self._set_row(pos, {f: self.normalize(record.get(f)) for f in self.fields})
+
+    def _set(self, pos, values):
+        row = {f: self.text(f, pos) for f in self.fields}
+        row.update((f, self.normalize(v)) for f, v in values.items() if f in row)
+        self._set_row(pos, row)
+
+    def _set_row(self, pos, row):
+        old = self.changed.get(pos)
+        for field in self.fields:
+            postings = self.postings[field]
+            if old is not None:
+                for gram in self.tokens(old[field]):
+                    entry = postings[gram]
+                    entry.discard(pos)
+                    if not entry:
+                        del postings[gram]
+            for gram in self.tokens(row[field]):
+                postings.setdefault(gram, set()).add(pos)
+        self.changed[pos] = row
+
+    def _fold(self):
+        base_texts, base_postings = {}, {}
+        for field in self.fields:
+            texts = list(self.base_texts[field])
+            postings = dict(self.base_postings[field])
+            copied = set()
+            for pos in sorted(self.changed):
+                text = self.changed[pos][field]
+                old = self.tokens(texts[pos]) if pos < len(texts) else set()
+                new = self.tokens(text)
+                for gram in old ^ new:
+                    if gram not in copied:
+                        postings[gram] = set(postings.get(gram, ()))
+                        copied.add(gram)
+                    if gram in new:
+                        postings[gram].add(pos)
+                    else:
+                        postings[gram].discard(pos)
+                if pos < len(texts):
+                    texts[pos] = text
+                else:
+                    texts.append(text)
+            base_texts[field] = texts
+            base_postings[field] = {g: s for g, s in postings.items() if s}
+        self.base_texts, self.base_postings = base_texts, base_postings
+        self.postings = {f: {} for f in self.fields}
+
+
+class SearchCache:
+    """Recent search results of one session, narrowed as the query grows.
+
+    Results are kept per (fields, query as the index normalises it) for one
+    `version` of the table, so a rerun with the same query is a lookup. A
+    query containing a cached one (typing "pon" after "po") re-checks that
+    result instead when it is smaller than what the index would look at.
+    The least recently used entries are dropped beyond `size`.
+    """
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self.version = None
+        self.entries = OrderedDict()  # (fields, normalised query) -> positions
+
+    def search(self, index, version, query, fields):
+        """index.search(query, fields), for the table at `version`."""
+        if version != self.version:
+            self.entries.clear()
+            self.version = version
+        fields, normalized = tuple(fields), index.prepare(query)[0]
+        key = (fields, normalized)
+        positions = self.entries.get(key)
+        if positions is not None:
+            self.entries.move_to_end(key)
+            return positions
+        narrower = max((q for f, q in self.entries if f == fields and q in normalized),
+                       key=len, default=None)
+        previous = self.entries[(fields, narrower)] if narrower is not None else None
+        if previous is not None and len(previous) * len(fields) < index.cost(query, fields):
+            positions = index.filter(previous, query, fields)
+        else:
+            positions = index.search(query, fields)
+        self.entries[key] = positions
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+        return positions
+
+
+def _postings(texts, tokens):
+    """{token: {pos, ...}} for (pos, text) pairs, cut with `tokens`."""
+    by_text = {}  # authors and empty fields repeat a lot: cut each text once
+    for pos, text in texts:
+        entry = by_text.get(text)
+        if entry is None:
+            by_text[text] = [pos]
+        else:
+            entry.append(pos)
+    postings = {}
+    for text, positions in by_text.items():
+        for gram in tokens(text):
+            entry = postings.get(gram)
+            if entry is None:
+                postings[gram] = set(positions)
+            else:
+                entry.update(positions)
+    return postings
+
+def _intersect(postings, query_grams):
+    sets = sorted((postings.get(g, _EMPTY) for g in query_grams), key=len)
+    return sets[0].intersection(*sets[1:])
@@ -0,0 +1,601 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+
+import pandas as pd
+from schema import SCHEMAS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # shadows are an optimisation; Excel alone still works
+    pa = pq = None
+
+# Storage backends for the four library tables.
+#
+# data_manager keeps working on whole DataFrames, but every save also passes
+# the row-level changes it made. The Excel backend rewrites the workbook (or,
+# for the transactions history, appends the changes to a journal); the SQLite
+# backend applies them directly, so a lend or return touches one row instead
+# of the whole table.
+
+TABLES = list(SCHEMAS)
+
+TABLE_COLUMNS = {name: schema.columns for name, schema in SCHEMAS.items()}
+
+EXCEL_FILES = {
+    'books': 'books.xlsx',
+    'users': 'users.xlsx',
+    'transactions': 'transactions.xlsx',
+    'pending': 'pending_approvals.xlsx',
+}
+
+class StaleJournalError(RuntimeError):
+    """A journal holds changes for a checkpoint other than the current workbook."""
+
+
+# --- Row-level changes ---
+# `rows` is a list of dicts; `where` is a dict of column -> value that must
+# all match (rows are selected the same way data_manager selects them).
+
+Insert = namedtuple('Insert', ['rows'])
+Update = namedtuple('Update', ['where', 'values'])
+Delete = namedtuple('Delete', ['where'])
+
+
+# Tables whose Excel backend appends row changes to a journal instead of
+# rewriting the workbook. The journal is folded into a fresh workbook (the
+# checkpoint) once it grows past JOURNAL_MAX_BYTES.
+JOURNALED_TABLES = {'transactions'}
+JOURNAL_MAX_BYTES = 256 * 1024
+
+# Parquet copies of the workbooks, see ExcelStorage._read_workbook.
+SHADOW_DIR = '.shadow'
+
+# Written while a multi-file commit is being applied, see ExcelStorage.commit.
+COMMIT_MARKER = '.commit'
+
+# Last allocated number of each ID sequence (GDL, MEM), see read_sequence.
+SEQUENCES_FILE = 'sequences.json'
+
+
+class ExcelStorage:
+    """One workbook per table in `data_dir` (the original layout).
+
+    Journaled tables are stored as a checkpoint workbook plus an append-only
+    `<table>.journal` of JSON lines. The journal's first line records the
+    SHA-256 of the checkpoint it extends, so copying data/ (which may not keep
+    mtimes) keeps the journal valid. A journal holding changes for a different
+    checkpoint, e.g. after the workbook was edited by hand, raises
+    StaleJournalError on read and write instead of losing them, so
+    checkpoint (data_manager.compact_journal) before editing the workbook.
+    """
+
+    name = 'excel'
+    journaled = JOURNALED_TABLES
+
+    def __init__(self, data_dir, shadows=True):
+        self.data_dir = data_dir
+        self.shadows = shadows and pq is not None
+        self._digests = {}  # path -> (stat signature, SHA-256) last computed
+
+    def path(self, table):
+        return os.path.join(self.data_dir, EXCEL_FILES[table])
+
+    def shadow_path(self, table):
+        return os.path.join(self.data_dir, SHADOW_DIR, f"{table}.parquet")
+
+    def journal_path(self, table):
+        return os.path.join(self.data_dir, f"{table}.journal")
+
+    def signature(self, table):
+        signature = _stat_signature(self.path(table))
+        if signature is not None and table in JOURNALED_TABLES:
+            signature += (_stat_signature(self.journal_path(table)),)
+        return signature
+
+    def read(self, table):
+        path = self.path(table)
+        if table == 'pending' and not os.path.exists(path):
+            # Create empty pending file if it doesn't exist
+            pending = SCHEMAS['pending'].frame([])
+            pending.to_excel(path, index=False)
+            return pending
+        df = self._read_workbook(table)
+        if table in JOURNALED_TABLES:
+            df = self._replay(table, df)
+        # Shadows and journals written before a column was added lack it;
+        # derived columns are recomputed in case of a hand edit.
+        return SCHEMAS[table].conform(df)
+
+    def write(self, table, df, changes=None):
+        self.commit({table: (df, changes)})
+
+    # --- ID sequences ---
+    # The last number handed out per ID prefix, so allocating GDL-/MEM- IDs
+    # doesn't scan the table. Only called under the writer lock.
+
+    def sequences_path(self):
+        return os.path.join(self.data_dir, SEQUENCES_FILE)
+
+    def read_sequence(self, name):
+        """Last allocated number of sequence `name`, or None if never stored."""
+        return self._read_sequences().get(name)
+
+    def write_sequence(self, name, value):
+        sequences = self._read_sequences()
+        sequences[name] = int(value)
+        _atomic_write_bytes(self.sequences_path(), json.dumps(sequences, indent=1).encode())
+
+    def _read_sequences(self):
+        try:
+            with open(self.sequences_path(), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    # --- Batched commits ---
+    # A commit first prepares everything it will touch: each rewritten table
+    # becomes a fully written `<name>.tmp.xlsx`, each journal append becomes
+    # (offset, bytes). When more than one file changes, that plan is saved as
+    # the COMMIT_MARKER before anything is applied. Applying the plan is
+    # idempotent, so recover() can finish a batch interrupted half-way; a batch
+    # that never got its marker leaves only temp files behind. A batch that
+    # fails to apply (disk full, permissions) is retried at once, and while its
+    # marker is left no other commit goes ahead without finishing it first:
+    # its journal offsets would otherwise truncate appends made since.
+
+    def commit(self, batch):
+        """Persists {table: (df, changes)} with each file written at most once."""
+        if os.path.exists(self.marker_path()):
+            self._finish_batch()
+        actions = []
+        rewritten = []
+        for table, (df, changes) in batch.items():
+            df = SCHEMAS[table].conform(df)
+            table_actions = self._plan(table, df, changes)
+            if table_actions[0]['op'] == 'rename':
+                rewritten.append((table, df))
+            actions.extend(table_actions)
+
+        if len(actions) > 1:
+            marker = self.marker_path()
+            _atomic_write_bytes(marker, json.dumps({'actions': actions}).encode())
+            try:
+                for action in actions:
+                    _apply_action(action)
+            except OSError:
+                self._finish_batch()  # raises, keeping the marker, if it fails again
+            else:
+                os.remove(marker)
+        else:
+            _apply_action(actions[0])
+
+        for table, df in rewritten:
+            self._write_shadow(table, df)
+
+    def recover(self):
+        """Finishes a committed batch and discards temp files of an unfinished one.
+
+        Call with the write lock held, before any other commit.
+        """
+        if os.path.exists(self.marker_path()):
+            self._finish_batch()
+        for table in TABLES:
+            root, ext = os.path.splitext(self.path(table))
+            try:
+                os.remove(f"{root}.tmp{ext}")
+            except FileNotFoundError:
+                pass
+
+    def marker_path(self):
+        return os.path.join(self.data_dir, COMMIT_MARKER)
+
+    def _finish_batch(self):
+        """Applies the batch saved in the marker, then removes the marker."""
+        marker = self.marker_path()
+        with open(marker, encoding='utf-8') as f:
+            actions = json.load(f)['actions']
+        for action in actions:
+            _apply_action(action)
+        os.remove(marker)
+
+    def _plan(self, table, df, changes):
+        if (table in JOURNALED_TABLES and changes is not None
+                and all(isinstance(c, (Insert, Update)) for c in changes)
+                and os.path.exists(self.path(table))):
+            action = self._plan_append(table, changes)
+            if action['offset'] + len(action['data'].encode('utf-8')) < JOURNAL_MAX_BYTES:
+                return [action]
+
+        # Rewrite the whole workbook. rename() keeps the temp file's mtime and
+        # size, so the new journal header can be computed before the rename.
+        path = self.path(table)
+        root, ext = os.path.splitext(path)
+        tmp = f"{root}.tmp{ext}"
+        df.to_excel(tmp, index=False)
+        _fsync_path(tmp)
+        actions = [{'op': 'rename', 'src': tmp, 'dst': path}]
+        if table in JOURNALED_TABLES:
+            header = {'sha256': self._sha256(tmp)}
+            self._digests[path] = self._digests.pop(tmp)
+            actions.append({'op': 'journal', 'path': self.journal_path(table),
+                            'offset': 0, 'data': json.dumps(header) + '\n'})
+        return actions
+
+    # --- Parquet shadows ---
+    # Parsing xlsx with openpyxl dominates a cold start. Each workbook gets a
+    # Parquet copy tagged with the workbook's (mtime, size) and SHA-256; the
+    # workbook is only parsed again when neither matches, i.e. it was edited
+    # outside data_manager.
+
+    def _read_workbook(self, table):
+        path = self.path(table)
+        if not self.shadows:
+            return SCHEMAS[table].read_excel(path)
+
+        shadow = self.shadow_path(table)
+        signature = _stat_signature(path)
+        try:
+            meta = pq.read_schema(shadow).metadata or {}
+        except (OSError, pa.ArrowException):
+            meta = {}
+        source = meta.get(b'library_source')
+        if source is not None:
+            source = json.loads(source)
+            if source['signature'] == list(signature) or source['sha256'] == self._sha256(path):
+                try:
+                    return pq.read_table(shadow).to_pandas()
+                except (OSError, pa.ArrowException):
+                    pass
+
+        df = SCHEMAS[table].read_excel(path)
+        self._write_shadow(table, df, signature)
+        return df
+
+    def _write_shadow(self, table, df, signature=None):
+        if not self.shadows:
+            return
+        path = self.path(table)
+        shadow = self.shadow_path(table)
+        source = {
+            'signature': list(signature or _stat_signature(path)),
+            'sha256': self._sha256(path),
+        }
+        try:
+            arrow_table = pa.Table.from_pandas(df, preserve_index=False)
+            arrow_table = arrow_table.replace_schema_metadata({
+                **(arrow_table.schema.metadata or {}),
+                b'library_source': json.dumps(source).encode(),
+            })
+            os.makedirs(os.path.dirname(shadow), exist_ok=True)
+            tmp = shadow + '.tmp'
+            pq.write_table(arrow_table, tmp)
+            os.replace(tmp, shadow)
+        except (OSError, pa.ArrowException):
+            # e.g. a column mixing floats and strings; the next read re-parses
+            # the workbook and shadows that instead.
+            try:
+                os.remove(shadow)
+            except FileNotFoundError:
+                pass
+
+    def _sha256(self, path):
+        """SHA-256 of the file at `path`, hashed again only once its stat changes."""
+        signature = _stat_signature(path)
+        cached = self._digests.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        digest = _file_sha256(path)
+        self._digests[path] = (signature, digest)
+        return digest
+
+    # --- Journal ---
+
+    def _header(self, table):
+        return {'sha256': self._sha256(self.path(table))}
+
+    def _extends(self, table, header):
+        """Whether a journal `header` belongs to the current checkpoint."""
+        if 'checkpoint' in header:
+            # Journals written before headers carried the SHA-256
+            return header['checkpoint'] == list(_stat_signature(self.path(table)))
+        return header == self._header(table)
+
+    def _check_journal(self, table, header, f):
+        """Raises StaleJournalError if `header` is stale and the journal `f` has changes."""
+        if self._extends(table, header) or not any(line.endswith('\n') for line in f):
+            return
+        raise StaleJournalError(
+            f"{self.journal_path(table)} holds changes made on top of a different "
+            f"{EXCEL_FILES[table]}. Restore the workbook it extends, or move the journal "
+            f"aside to discard those changes.")
+
+    def _plan_append(self, table, changes):
+        journal = self.journal_path(table)
+        lines = []
+        try:
+            with open(journal, encoding='utf-8') as f:
+                header = json.loads(f.readline() or 'null')
+                if header is not None:
+                    self._check_journal(table, header, f)
+        except (FileNotFoundError, ValueError):
+            header = None
+        if header is not None and self._extends(table, header):
+            offset = _complete_lines_end(journal)
+        else:
+            # Missing or empty stale journal: start a fresh one for this checkpoint.
+            offset = 0
+            lines.append(json.dumps(self._header(table)) + '\n')
+
+        for change in changes:
+            if isinstance(change, Insert):
+                event = {'op': 'insert', 'rows': [_plain_row(row) for row in change.rows]}
+            else:
+                event = {'op': 'update', 'where': _plain_row(change.where),
+                         'values': _plain_row(change.values)}
+            lines.append(json.dumps(event, ensure_ascii=False) + '\n')
+        return {'op': 'journal', 'path': journal, 'offset': offset, 'data': ''.join(lines)}
+
+    def _replay(self, table, df):
+        """Applies the journal tail on top of the checkpoint `df`."""
+        try:
+            f = open(self.journal_path(table), encoding='utf-8')
+        except FileNotFoundError:
+            return df
+        with f:
+            try:
+                header = json.loads(f.readline() or 'null')
+            except ValueError:
+                return df
+            if header is None:
+                return df
+            if not self._extends(table, header):
+                self._check_journal(table, header, f)
+                return df
+
+            inserted = []
+            for line in f:
+                if not line.endswith('\n'):
+                    break  # torn final append
+                event = json.loads(line)
+                if event['op'] == 'insert':
+                    inserted.extend(event['rows'])
+                    continue
+                if inserted:
+                    df = pd.concat([df, SCHEMAS[table].frame(inserted)], ignore_index=True)
+                    inserted = []
+                mask = pd.Series(True, index=df.index)
+                for col, val in event['where'].items():
+                    mask &= df[col] == val
+                for col, val in event['values'].items():
+                    df.loc[mask, col] = val
+            if inserted:
+                df = pd.concat([df, SCHEMAS[table].frame(inserted)], ignore_index=True)
+        return df
+
+
+class SQLiteStorage:
+    """All tables in one SQLite database in WAL mode, with indexed lookups."""
+
+    name = 'sqlite'
+    journaled = frozenset()  # every change is applied in place
+
+    INDEXES = """
+    CREATE INDEX IF NOT EXISTS idx_books_status ON books(status);
+    CREATE INDEX IF NOT EXISTS idx_users_mobile ON users(mobile);
+    CREATE INDEX IF NOT EXISTS idx_users_mobile_norm ON users(mobile_norm);
+    CREATE INDEX IF NOT EXISTS idx_transactions_tx ON transactions(transaction_id);
+    CREATE INDEX IF NOT EXISTS idx_transactions_book ON transactions(book_id, status);
+    CREATE INDEX IF NOT EXISTS idx_transactions_user ON transactions(user_id);
+    CREATE INDEX IF NOT EXISTS idx_transactions_status ON transactions(status);
+    CREATE INDEX IF NOT EXISTS idx_pending_tx ON pending(transaction_id);
+    CREATE INDEX IF NOT EXISTS idx_pending_user ON pending(user_id);
+
+    -- Bumped in the same transaction as every write; used to validate caches.
+    CREATE TABLE IF NOT EXISTS table_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL);
+
+    -- Last allocated number per ID prefix (GDL, MEM).
+    CREATE TABLE IF NOT EXISTS sequences (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+    """
+
+    def __init__(self, db_path, create=False):
+        """Opens the database at `db_path`; only `create` makes a new, empty one."""
+        if not create and not os.path.exists(db_path):
+            raise FileNotFoundError(
+                f"SQLite database '{db_path}' not found. Run migrate_to_sqlite.py to import "
+                f"the Excel workbooks into it before starting with LIBRARY_STORAGE=sqlite.")
+        self.db_path = db_path
+        self._local = threading.local()
+        conn = self._connect()
+        for schema in SCHEMAS.values():
+            columns = [f"{col} TEXT PRIMARY KEY" if col == schema.key and schema.unique_key
+                       else f"{col} TEXT" for col in schema.columns]
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {schema.name} ({', '.join(columns)})")
+        added = self._add_missing_columns(conn)
+        conn.executescript(self.INDEXES)
+        conn.executemany("INSERT OR IGNORE INTO table_versions (name, version) VALUES (?, 0)",
+                         [(t,) for t in TABLES])
+        conn.commit()
+        if added:
+            # Fill columns added to the schema (e.g. derived ones) for existing rows
+            self.commit({table: (self.read(table), None) for table in added})
+
+    def _add_missing_columns(self, conn):
+        """ALTERs tables created by an older schema; returns the tables changed."""
+        added = []
+        for schema in SCHEMAS.values():
+            existing = {row[1] for row in conn.execute(f"PRAGMA table_info({schema.name})")}
+            missing = [col for col in schema.columns if col not in existing]
+            for col in missing:
+                conn.execute(f"ALTER TABLE {schema.name} ADD COLUMN {col} TEXT")
+            if missing:
+                added.append(schema.name)
+        return added
+
+    def _connect(self):
+        # sqlite3 connections are per-thread; Streamlit runs sessions in threads.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def signature(self, table):
+        row = self._connect().execute(
+            "SELECT version FROM table_versions WHERE name = ?", (table,)).fetchone()
+        return row[0] if row else None
+
+    def read(self, table):
+        columns = ", ".join(TABLE_COLUMNS[table])
+        df = pd.read_sql_query(f"SELECT {columns} FROM {table} ORDER BY rowid", self._connect())
+        return SCHEMAS[table].conform(df)
+
+    def read_sequence(self, name):
+        row = self._connect().execute(
+            "SELECT value FROM sequences WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def write_sequence(self, name, value):
+        conn = self._connect()
+        with conn:
+            conn.execute("INSERT INTO sequences (name, value) VALUES (?, ?) "
+                         "ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+                         (name, int(value)))
+
+    def recover(self):
+        pass  # SQLite rolls back unfinished transactions itself
+
+    def write(self, table, df, changes=None):
+        self.commit({table: (df, changes)})
+
+    def commit(self, batch):
+        """Applies {table: (df, changes)} in a single SQLite transaction."""
+        conn = self._connect()
+        with conn:
+            for table, (df, changes) in batch.items():
+                if changes is None:
+                    conn.execute(f"DELETE FROM {table}")
+                    self._insert(conn, table, df.to_dict('records'))
+                else:
+                    for change in changes:
+                        self._apply(conn, table, change)
+                conn.execute("UPDATE table_versions SET version = version + 1 WHERE name = ?",
+                             (table,))
+
+    def _apply(self, conn, table, change):
+        if isinstance(change, Insert):
+            self._insert(conn, table, change.rows)
+        elif isinstance(change, Update):
+            where, params = _where_clause(change.where)
+            sets = ", ".join(f"{col} = ?" for col in change.values)
+            values = [_sql_value(v) for v in change.values.values()]
+            conn.execute(f"UPDATE {table} SET {sets} WHERE {where}", values + params)
+        elif isinstance(change, Delete):
+            where, params = _where_clause(change.where)
+            conn.execute(f"DELETE FROM {table} WHERE {where}", params)
+        else:
+            raise TypeError(f"Unknown change: {change!r}")
+
+    def _insert(self, conn, table, rows):
+        columns = TABLE_COLUMNS[table]
+        placeholders = ", ".join("?" for _ in columns)
+        conn.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+            [[_sql_value(row.get(col)) for col in columns] for row in rows])
+
+
+def _stat_signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _fsync_path(path):
+    with open(path, 'rb') as f:
+        os.fsync(f.fileno())
+
+def _atomic_write_bytes(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def _complete_lines_end(path):
+    """Offset just past the last newline, dropping a torn final append."""
+    with open(path, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return 0
+        f.seek(size - 1)
+        if f.read(1) == b'\n':
+            return size
+        f.seek(0)
+        return f.read().rfind(b'\n') + 1
+
+def _apply_action(action):
+    if action['op'] == 'rename':
+        # Already renamed if a recovery re-runs this action.
+        if os.path.exists(action['src']):
+            os.replace(action['src'], action['dst'])
+    elif action['op'] == 'journal':
+        fd = os.open(action['path'], os.O_RDWR | os.O_CREAT, 0o644)
+        with os.fdopen(fd, 'r+b') as f:
+            f.truncate(action['offset'])
+            f.seek(action['offset'])
+            f.write(action['data'].encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+    else:
+        raise ValueError(f"Unknown commit action: {action!r}")
+
+def _plain_row(row):
+    return {col: _sql_value(val) for col, val in row.items()}
+
+def _where_clause(where):
+    clause = " AND ".join(f"{col} = ?" for col in where)
+    return clause, [_sql_value(v) for v in where.values()]
+
+def _sql_value(val):
+    if hasattr(val, 'item'):
+        # numpy scalar -> plain Python value
+        val = val.item()
+    if val is None or pd.isna(val):
+        return None
+    if isinstance(val, float) and val.is_integer():
+        # Mobile numbers parsed from Excel come back as floats
+        return str(int(val))
+    return val if isinstance(val, str) else str(val)
+
+
+def open_storage(backend, data_dir, db_path=None):
+    """Returns the storage for `backend` ('excel' or 'sqlite')."""
+    if backend == 'excel':
+        return ExcelStorage(data_dir)
+    if backend == 'sqlite':
+        return SQLiteStorage(db_path or os.path.join(data_dir, 'library.db'))
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+def copy_tables(source, target, tables=TABLES):
+    """Copies whole tables between backends (Excel import/export)."""
+    counts = {}
+    for table in tables:
+        df = source.read(table)
+        target.write(table, df)
+        counts[table] = len(df)
+    return counts
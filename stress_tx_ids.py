@@ -0,0 +1,89 @@
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+# Stress test for transaction IDs.
+#
+#   python stress_tx_ids.py [ids_per_worker] [requests]
+#
+# 1. Several processes x threads call get_next_tx_id() as fast as they can;
+#    every ID must be unique and each thread must see them in sorted order.
+# 2. On a copy of data/, a burst of threads records interest requests at once;
+#    every pending row must get its own transaction_id.
+#
+# Exits non-zero on any duplicate.
+
+SOURCE_DATA_DIR = os.path.abspath("data")
+PROCESSES = 4
+THREADS = 4
+
+def _generate(count):
+    import data_manager as dm
+    ids = [dm.get_next_tx_id() for _ in range(count)]
+    return ids, ids == sorted(ids)
+
+def _process_worker(count):
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(THREADS) as pool:
+        return list(pool.map(_generate, [count] * THREADS))
+
+def stress_generator(per_worker):
+    start = time.perf_counter()
+    with multiprocessing.Pool(PROCESSES) as pool:
+        results = [r for batch in pool.map(_process_worker, [per_worker] * PROCESSES)
+                   for r in batch]
+    elapsed = time.perf_counter() - start
+    ids = [tx_id for batch, _ in results for tx_id in batch]
+    duplicates = len(ids) - len(set(ids))
+    ordered = all(in_order for _, in_order in results)
+    print(f"generator: {len(ids)} IDs from {PROCESSES} processes x {THREADS} threads "
+          f"in {elapsed * 1000:.0f} ms ({len(ids) / elapsed:,.0f}/s), "
+          f"duplicates={duplicates}, per-thread order={'ok' if ordered else 'BROKEN'}")
+    return duplicates == 0 and ordered
+
+def stress_requests(n):
+    work_dir = tempfile.mkdtemp(prefix="library-stress-")
+    try:
+        shutil.copytree(SOURCE_DATA_DIR, os.path.join(work_dir, "data"))
+        os.chdir(work_dir)  # data_manager resolves data/ relative to the cwd
+        import data_manager as dm
+
+        before = len(dm.get_pending())
+        barrier = threading.Barrier(n)
+
+        def visitor(i):
+            barrier.wait()
+            dm.express_interest("GDL-001", "Stress", f"Visitor {i}", str(9200000000 + i), "")
+
+        threads = [threading.Thread(target=visitor, args=(i,)) for i in range(n)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        dm.invalidate_cache()
+        created = dm.get_pending().iloc[before:]
+        duplicates = len(created) - created['transaction_id'].nunique()
+        print(f"requests: {len(created)}/{n} interest requests in {elapsed * 1000:.0f} ms "
+              f"({n / elapsed:,.0f}/s), duplicates={duplicates}")
+        return len(created) == n and duplicates == 0
+    finally:
+        os.chdir(os.path.dirname(SOURCE_DATA_DIR))
+        shutil.rmtree(work_dir)
+
+def main():
+    per_worker = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    ok = stress_generator(per_worker)
+    ok = stress_requests(requests) and ok
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import re
+import unicodedata
+from bisect import bisect_left
+
+import numpy as np
+from schema import DELETED
+from search_index import LAST, OverlayIndex, normalize
+
+# Autocomplete over the catalog's text fields.
+#
+# Each distinct text of a field (a title, an author, their Tanglish forms) is
+# a phrase, weighted by popularity: the live copies carrying it plus the
+# times those copies were lent. A sorted array holds every word start of
+# every phrase ("ponniyin selvan", "selvan") next to an array of the phrase's
+# popularity rank, so the completions of a prefix are one bisect away and the
+# top N of them are the N smallest ranks in that slice (np.argpartition, so a
+# one-letter prefix doesn't sort thousands of phrases).
+#
+# The overlay (see OverlayIndex in search_index.py) holds the rows changed
+# since the arrays were built and the new weights of their phrases. A book
+# Update to LENT (approve_lend) counts as one more loan of that copy; an
+# Update to DELETED drops its weight.
+
+SUGGESTIONS = 8
+STATUS = 'status'
+LENT = 'LENT'
+
+_WORD_START = re.compile(r'(?:^|(?<=[\s"\'(\[\-:,.]))(?=[^\s"\'(\[\-:,.])')
+
+
+def phrase(value):
+    """Text as completed: NFC, lower-cased, single spaces ('' if missing)."""
+    return " ".join(unicodedata.normalize('NFC', normalize(value)).split())
+
+def word_starts(text):
+    """`text` from each of its word starts."""
+    return {text[m.start():] for m in _WORD_START.finditer(text)}
+
+
+class SuggestIndex(OverlayIndex):
+    """Word-start completions of the text `fields` of a table, by popularity."""
+
+    def __init__(self, key, fields):
+        super().__init__(key, (*fields, STATUS))
+        self.fields = tuple(fields)
+        self.base_starts = {f: [] for f in self.fields}   # field -> sorted word starts
+        self.base_ranks = {f: None for f in self.fields}  # field -> rank of each start's phrase
+        self.base_ranked = {f: [] for f in self.fields}   # field -> [(-weight, phrase)] by rank
+        self.base_weights = {f: {} for f in self.fields}  # field -> {phrase: weight}
+        self.base_display = {f: {} for f in self.fields}  # field -> {phrase: text as shown}
+        self.base_rows = []                               # pos -> (phrases, loans, live)
+        # `changed` holds pos -> (phrases, loans, live)
+        self.weights = {f: {} for f in self.fields}       # field -> {phrase: weight}
+        self.display = {f: {} for f in self.fields}       # field -> {new phrase: text as shown}
+
+    @classmethod
+    def build(cls, df, key, fields, loans=None):
+        """Index of `df`; `loans` maps a key value to its number of loans."""
+        index = cls(key, fields)
+        loans = loans or {}
+        columns = []
+        for field in index.fields:
+            seen = {}  # authors repeat a lot: normalise each text once
+            columns.append([seen[v] if v in seen else seen.setdefault(v, index._phrase(field, v))
+                            for v in df[field].tolist()])
+        index.base_display, index.display = index.display, {f: {} for f in index.fields}
+        statuses = df[STATUS].tolist()
+        values = df[key].tolist()
+        index._build_keys(values)
+        for pos, value in enumerate(values):
+            row = (tuple(c[pos] for c in columns), int(loans.get(value, 0)),
+                   statuses[pos] != DELETED)
+            index.base_rows.append(row)
+            if row[2]:
+                for field, text in zip(index.fields, row[0]):
+                    if text:
+                        weights = index.base_weights[field]
+                        weights[text] = weights.get(text, 0) + _weight(row)
+        index._rank()
+        return index
+
+    def suggest(self, prefix, fields, n=SUGGESTIONS):
+        """The `n` most popular texts of `fields` with a word starting with `prefix`."""
+        text = phrase(prefix)
+        if not text:
+            return []
+        if prefix[-1:].isspace():
+            text += " "  # "ponniyin " completes the next word
+        found = []  # (-weight, phrase, field)
+        for field in fields:
+            found.extend((-w, p, field) for p, w in self._completions(field, text, n))
+        best, shown = [], set()
+        for _, text, field in sorted(found):
+            display = self.display[field].get(text) or self.base_display[field][text]
+            if display not in shown:
+                shown.add(display)
+                best.append(display)
+                if len(best) == n:
+                    break
+        return best
+
+    def weight(self, field, text):
+        weight = self.weights[field].get(text)
+        return self.base_weights[field].get(text, 0) if weight is None else weight
+
+    def _completions(self, field, text, n):
+        """(phrase, weight) of the top `n` phrases of `field` completing `text`."""
+        starts = self.base_starts[field]
+        lo = bisect_left(starts, text)
+        ranks = self.base_ranks[field][lo:bisect_left(starts, text + LAST, lo)]
+        ranked = self.base_ranked[field]
+        overlay = self.weights[field]
+        k = n
+        while True:
+            # A phrase can start at two words, and changed ones are in the overlay
+            whole = len(ranks) <= 2 * k
+            top = np.unique(ranks if whole else ranks[np.argpartition(ranks, k)[:k]])
+            found = [(p, -w) for w, p in (ranked[r] for r in top.tolist()) if p not in overlay]
+            if whole or len(found) >= n:
+                break
+            k *= 4
+        found = found[:n]
+        found.extend((p, w) for p, w in overlay.items() if w and text in p and _completes(p, text))
+        return found
+
+    def _phrase(self, field, value):
+        """phrase(value), remembering how it is shown if it is new."""
+        text = phrase(value)
+        if text and text not in self.base_display[field] and text not in self.display[field]:
+            self.display[field][text] = " ".join(str(value).split())
+        return text
+
+    def _row(self, pos):
+        row = self.changed.get(pos)
+        return self.base_rows[pos] if row is None else row
+
+    def _copy_overlay(self, other):
+        other.weights = {f: dict(w) for f, w in self.weights.items()}
+        other.display = {f: dict(d) for f, d in self.display.items()}
+
+    def _insert(self, pos, record):
+        self._set_row(pos, (tuple(self._phrase(f, record.get(f)) for f in self.fields),
+                            0, record.get(STATUS) != DELETED))
+
+    def _set(self, pos, values):
+        phrases, loans, live = self._row(pos)
+        phrases = tuple(self._phrase(f, values[f]) if f in values else p
+                        for f, p in zip(self.fields, phrases))
+        if STATUS in values:
+            loans += values[STATUS] == LENT
+            live = values[STATUS] != DELETED
+        self._set_row(pos, (phrases, loans, live))
+
+    def _set_row(self, pos, row):
+        old = self._row(pos) if pos < len(self.base_rows) or pos in self.changed else None
+        for i, field in enumerate(self.fields):
+            if old is not None and old[0][i]:
+                self._add(field, old[0][i], -_weight(old))
+            if row[0][i]:
+                self._add(field, row[0][i], _weight(row))
+        self.changed[pos] = row
+
+    def _add(self, field, text, weight):
+        if weight:
+            self.weights[field][text] = self.weight(field, text) + weight
+
+    def _rank(self):
+        """Orders the base phrases by popularity and their word starts by text."""
+        self.base_ranked, self.base_starts, self.base_ranks = {}, {}, {}  # new: copies share the old
+        for field in self.fields:
+            ranked = sorted((-w, p) for p, w in self.base_weights[field].items())
+            starts, ranks = [], []
+            for rank, (_, text) in enumerate(ranked):
+                for start in word_starts(text):
+                    starts.append(start)
+                    ranks.append(rank)
+            order = sorted(range(len(starts)), key=starts.__getitem__)
+            self.base_ranked[field] = ranked
+            self.base_starts[field] = [starts[i] for i in order]
+            self.base_ranks[field] = np.array(ranks, dtype=np.int64)[order]
+
+    def _fold(self):
+        rows = list(self.base_rows)
+        for pos in sorted(self.changed):
+            if pos < len(rows):
+                rows[pos] = self.changed[pos]
+            else:
+                rows.append(self.changed[pos])
+        weights = {f: {**self.base_weights[f], **self.weights[f]} for f in self.fields}
+        self.base_weights = {f: {p: w for p, w in weights[f].items() if w} for f in self.fields}
+        self.base_display = {f: {**self.base_display[f], **self.display[f]} for f in self.fields}
+        self.base_rows = rows
+        self._rank()
+        self.weights = {f: {} for f in self.fields}
+        self.display = {f: {} for f in self.fields}
+
+
+def _weight(row):
+    """What a (phrases, loans, live) row adds to each of its phrases."""
+    _, loans, live = row
+    return 1 + loans if live else 0
+
+def _completes(text, prefix):
+    return any(start.startswith(prefix) for start in word_starts(text))
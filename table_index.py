@@ -0,0 +1,171 @@
+from bisect import insort
+
+import pandas as pd
+from storage import Insert, Update
+
+# Dictionary indexes over the rows of one table.
+#
+# Each indexed column maps its (normalised) value to the positions of the rows
+# holding it, so a point lookup is a dict get instead of a column scan. An
+# index can also be composite: a tuple of columns such as ('book_id',
+# 'status') is looked up with a tuple of values, compared as stored.
+# Positions are row positions (iloc) in the table as stored. Between full
+# rewrites, rows of books, members and transactions are only appended or
+# updated in place (deleting a book or member leaves a tombstone), so inserts
+# and updates are applied to the index as they are made. Anything else, such
+# as a pending request being removed, makes apply() return False and the
+# caller rebuilds.
+
+
+class TableIndex:
+    """Hash indexes on `columns` ({column or tuple of columns: normalise function or None}).
+
+    `key` is the table's primary key column, used to find the rows an Update
+    touches. Instances are never changed once shared: copy() before apply().
+    """
+
+    def __init__(self, key, columns):
+        self.key = key
+        self.normalize = {col: fn or _identity for col, fn in columns.items()}
+        self.positions = {col: {} for col in columns}  # column -> {value: (pos, ...)}
+        self.values = {col: [] for col in columns}     # column -> stored value at each pos
+        self.rows = 0
+
+    @classmethod
+    def build(cls, df, key, columns):
+        index = cls(key, columns)
+        for col in columns:
+            if isinstance(col, tuple):
+                raw = zip(*(df[c].tolist() for c in col))
+            else:
+                raw = df[col].tolist()
+            values = [index._stored(col, v) for v in raw]
+            groups = {}
+            for pos, value in enumerate(values):
+                value = index._lookup_key(col, value)
+                if value is not None:
+                    groups.setdefault(value, []).append(pos)
+            index.positions[col] = {value: tuple(group) for value, group in groups.items()}
+            index.values[col] = values
+        index.rows = len(df)
+        return index
+
+    def copy(self):
+        other = TableIndex.__new__(TableIndex)
+        other.key = self.key
+        other.normalize = self.normalize
+        other.positions = {col: dict(p) for col, p in self.positions.items()}
+        other.values = {col: list(v) for col, v in self.values.items()}
+        other.rows = self.rows
+        return other
+
+    def normalized(self, column, value):
+        """The index key of `value` in `column` (None for a missing or empty value)."""
+        return self._lookup_key(column, self._stored(column, value))
+
+    def get(self, column, value):
+        """Positions of the rows whose `column` matches `value`, in table order."""
+        key = self.normalized(column, value)
+        return () if key is None else self.positions[column].get(key, ())
+
+    def apply(self, changes, rows):
+        """Applies storage row changes; False if the index must be rebuilt.
+
+        `rows` is the row count of the table after the changes.
+        """
+        for change in changes:
+            if isinstance(change, Insert):
+                self._append(change.rows)
+                continue
+            if not isinstance(change, Update):
+                return False
+            moved = [col for col in self.positions if set(_sources(col)) & set(change.values)]
+            if not moved:
+                continue  # e.g. a return date: no indexed column changes
+            if self.key not in change.where or self.key not in self.positions:
+                return False
+            for pos in self.get(self.key, change.where[self.key]):
+                matches = self._matches(pos, change.where)
+                if matches is None:
+                    return False
+                if matches:
+                    for col in moved:
+                        self._move(col, pos, change.values)
+        return self.rows == rows
+
+    def _stored(self, col, raw):
+        """What values[col] keeps for a raw cell (a tuple of cells for a composite)."""
+        if isinstance(col, tuple):
+            return tuple(None if _missing(v) or v == "" else v for v in raw)
+        if _missing(raw):
+            return None
+        key = self.normalize[col](raw)
+        return None if key == "" else key
+
+    def _lookup_key(self, col, stored):
+        if isinstance(col, tuple) and stored is not None and None in stored:
+            return None
+        return stored
+
+    def _append(self, records):
+        for record in records:
+            pos = self.rows
+            for col, positions in self.positions.items():
+                if isinstance(col, tuple):
+                    value = self._stored(col, tuple(record.get(c) for c in col))
+                else:
+                    value = self._stored(col, record.get(col))
+                self.values[col].append(value)
+                key = self._lookup_key(col, value)
+                if key is not None:
+                    positions[key] = positions.get(key, ()) + (pos,)
+            self.rows += 1
+
+    def _current(self, column, pos):
+        """The value of `column` at `pos` as stored, or KeyError if not indexed as-is."""
+        if column in self.values and self.normalize[column] is _identity:
+            return self.values[column][pos]
+        for col in self.values:
+            if isinstance(col, tuple) and column in col:
+                return self.values[col][pos][col.index(column)]
+        raise KeyError(column)
+
+    def _matches(self, pos, where):
+        """Whether row `pos` meets the non-key `where` conditions (None if unknown)."""
+        try:
+            return all(self._current(col, pos) == (None if _missing(value) or value == "" else value)
+                       for col, value in where.items() if col != self.key)
+        except KeyError:
+            return None
+
+    def _move(self, col, pos, changed):
+        positions = self.positions[col]
+        old = self.values[col][pos]
+        old_key = self._lookup_key(col, old)
+        if old_key is not None:
+            remaining = tuple(p for p in positions[old_key] if p != pos)
+            if remaining:
+                positions[old_key] = remaining
+            else:
+                del positions[old_key]
+        if isinstance(col, tuple):
+            value = self._stored(col, tuple(changed[c] if c in changed else old[i]
+                                            for i, c in enumerate(col)))
+        else:
+            value = self._stored(col, changed[col])
+        self.values[col][pos] = value
+        key = self._lookup_key(col, value)
+        if key is not None:
+            entry = list(positions.get(key, ()))
+            insort(entry, pos)
+            positions[key] = tuple(entry)
+
+
+def _sources(col):
+    return col if isinstance(col, tuple) else (col,)
+
+def _identity(value):
+    return value
+
+def _missing(value):
+    return value is None or (not isinstance(value, str) and pd.isna(value))
@@ -0,0 +1,64 @@
+import re
+import unicodedata
+
+from search_index import NgramIndex, normalize
+
+# Grapheme-level search for Tamil text.
+#
+# One visible Tamil letter is often several code points (consonant + vowel
+# sign, consonant + pulli), and some vowel signs have two encodings: ொ is
+# U+0BCA or U+0BC6 U+0BBE. Matching raw code points therefore misses
+# differently encoded titles and lets "க" match inside "கா". Texts and
+# queries here are canonically decomposed (NFD, so both encodings of ொ are
+# ெ + ா) and split into grapheme clusters (a base character with its
+# combining marks), and matching is on whole clusters. The last cluster of a
+# query may still be being typed (a consonant before its vowel sign or
+# pulli), so it matches the start of a cluster: "பொன" finds "பொன்னியின்".
+# The index is over pairs of adjacent clusters.
+
+N = 2
+SEP = '\x1f'  # between clusters: "கா" in "\x1fகா\x1fல\x1f" only matches whole clusters
+
+_TAMIL = re.compile('[\u0b80-\u0bff]')
+_JOINERS = re.compile('[\u200b-\u200d]')  # zero-width (non-)joiners: no visible difference
+
+
+def is_tamil(text):
+    return bool(_TAMIL.search(str(text)))
+
+def clusters(text):
+    """Grapheme clusters of `text`: each base character with the marks that follow it."""
+    result = []
+    for char in text:
+        if result and unicodedata.category(char).startswith('M'):
+            result[-1] += char
+        else:
+            result.append(char)
+    return result
+
+def grapheme_text(value):
+    """NFD, lower-cased clusters of `value` wrapped in SEP ('' if empty)."""
+    text = _JOINERS.sub('', unicodedata.normalize('NFD', normalize(value)))
+    return SEP + SEP.join(clusters(text)) + SEP if text else ""
+
+def grapheme_grams(text):
+    """The distinct runs of N adjacent clusters of a grapheme_text()."""
+    parts = text[1:-1].split(SEP) if text else []
+    return {SEP.join(parts[i:i + N]) for i in range(len(parts) - N + 1)}
+
+
+class GraphemeIndex(NgramIndex):
+    """Cluster-pair postings over `fields`, for grapheme-correct Tamil search.
+
+    Kept in sync like NgramIndex; texts are grapheme_text() forms.
+    """
+
+    normalize = staticmethod(grapheme_text)
+    tokens = staticmethod(grapheme_grams)
+
+    def prepare(self, query):
+        """The query without its closing SEP, and the pairs of its complete clusters."""
+        text = grapheme_text(query)
+        if not text:
+            return text, set()
+        return text[:-1], grapheme_grams(text[:text.rindex(SEP, 0, len(text) - 1) + 1])
@@ -1,4 +1,7 @@
+import unicodedata
+
 import pandas as pd
+from tamil_index import GraphemeIndex
 
 def verify_search_logic():
     # Mock Data
@@ -38,5 +41,22 @@ def verify_search_logic():
     ]
     print(f"Search '{q3}': Found {len(res3)} (Expected 1)")
 
+def verify_tamil_keystrokes():
+    # Search runs on every keystroke: each prefix of a Tamil title, typed with
+    # composed or with two-part vowel signs, must keep finding it
+    titles = ['பொன்னியின் செல்வன்', 'சிவகாமியின் சபதம்', 'கௌதம புத்தர்']
+    index = GraphemeIndex.build(pd.DataFrame({'id': ['GDL-001', 'GDL-002', 'GDL-003'],
+                                              'title': titles}), 'id', ['title'])
+
+    print("Testing Tamil keystroke prefixes...")
+    for pos, title in enumerate(titles):
+        for form in ('NFC', 'NFD'):
+            typed = unicodedata.normalize(form, title)
+            for end in range(1, len(typed) + 1):
+                found = index.search(typed[:end], ['title'])
+                assert pos in found, f"{form} prefix {typed[:end]!r} lost {title!r}: {found}"
+        print(f"'{title}': every prefix found it")
+
 if __name__ == "__main__":
     verify_search_logic()
+    verify_tamil_keystrokes()
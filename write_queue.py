@@ -0,0 +1,166 @@
+import queue
+import threading
+import time
+from collections import deque
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Single-writer queue with group commit.
+#
+# Every data_manager mutation is handed to one worker thread. The worker takes
+# the first waiting operation, collects whatever else arrives within `window`
+# seconds (up to `max_batch`), and runs the lot under the inter-process file
+# lock inside one batch context (data_manager's unit of work). Each touched
+# table is then written once per batch instead of once per click.
+
+
+class FileLock:
+    """Exclusive lock on `path`, held across processes (e.g. several app workers)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, 'a+b')
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._file.close()
+        self._file = None
+
+
+class _Op:
+    def __init__(self, func, args, kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.submitted = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class WriteQueue:
+    """Serialises mutations through one thread and coalesces them into batches.
+
+    `batch` is a context-manager factory yielding an object with `savepoint()`
+    and `rollback(savepoint)`: an operation that raises is rolled back on its
+    own while the rest of its batch still commits.
+    """
+
+    def __init__(self, batch, lock_path, window=0.02, max_batch=64, history=1000):
+        self.batch = batch
+        self.lock_path = lock_path
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._latencies = deque(maxlen=history)
+        self._batch_sizes = deque(maxlen=history)
+        self._ops = 0
+
+    def in_worker(self):
+        return threading.current_thread() is self._thread
+
+    def submit(self, func, *args, **kwargs):
+        """Runs func(*args, **kwargs) on the writer thread and returns its result."""
+        if self.in_worker():
+            # Nested mutation (e.g. lend_book_request -> register_member)
+            return func(*args, **kwargs)
+        self._ensure_worker()
+        op = _Op(func, args, kwargs)
+        self._queue.put(op)
+        op.done.wait()
+        if op.error is not None:
+            raise op.error
+        return op.result
+
+    def stats(self):
+        """Per-operation latency (ms) and batch sizes over recent history."""
+        with self._stats_lock:
+            latencies = sorted(self._latencies)
+            sizes = list(self._batch_sizes)
+            ops = self._ops
+        if not latencies:
+            return {'ops': ops, 'batches': 0}
+
+        def pct(p):
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+
+        return {
+            'ops': ops,
+            'batches': len(sizes),
+            'mean_batch': sum(sizes) / len(sizes),
+            'max_batch': max(sizes),
+            'p50_ms': pct(0.50),
+            'p95_ms': pct(0.95),
+            'max_ms': latencies[-1] * 1000,
+        }
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._latencies.clear()
+            self._batch_sizes.clear()
+            self._ops = 0
+
+    def _ensure_worker(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="library-writer",
+                                                daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        ops = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(ops) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                ops.append(self._queue.get(timeout=remaining) if remaining > 0
+                           else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return ops
+
+    def _run(self):
+        while True:
+            ops = self._collect()
+            try:
+                with FileLock(self.lock_path), self.batch() as batch:
+                    for op in ops:
+                        savepoint = batch.savepoint()
+                        try:
+                            op.result = op.func(*op.args, **op.kwargs)
+                        except Exception as e:
+                            batch.rollback(savepoint)
+                            op.error = e
+            except Exception as e:
+                # The batch failed to commit: nothing in it was written.
+                for op in ops:
+                    if op.error is None:
+                        op.error = e
+
+            finished = time.perf_counter()
+            with self._stats_lock:
+                self._ops += len(ops)
+                self._batch_sizes.append(len(ops))
+                self._latencies.extend(finished - op.submitted for op in ops)
+            for op in ops:
+                op.done.set()